@@ -1,35 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from flask_mysqldb import MySQL
+from flask import Blueprint, Flask, Response, abort, current_app, jsonify, render_template, stream_template, request, redirect, url_for, session, flash, get_flashed_messages, g
+import MySQLdb
 from flask_wtf.csrf import CSRFProtect
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests
+from markupsafe import Markup
 from dotenv import load_dotenv
 import os
 import re
 import logging
+import hashlib
+import threading
+import time
+import click
+import json
+import sys
+from contextlib import contextmanager
 from functools import wraps
+from scoreboard import REGULAR_SEASON, ScoreboardCache, makeSource, parseScoreboard
+from scoring import predictionArrays, scoreWeek
+from db import MySQLPool, QueryStats, prometheusText, timedExecute
+from cache import cacheKey, makeStore
+from archive import ArchiveWriter, SnapshotArchive
+from live import LivePoller, gameData
+from migrate import migrate, pendingMigrations
+from config import DEFAULT_SECRET_KEY, config
 
 load_dotenv()
 
-app = Flask(__name__)
-app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
-app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
-app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
-app.config['MYSQL_DB'] = os.getenv('MYSQL_DB')
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-# Security configurations
-app.config['WTF_CSRF_ENABLED'] = True
-app.config['WTF_CSRF_TIME_LIMIT'] = 3600
-app.config['SESSION_COOKIE_SECURE'] = True if not app.debug else False
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
-
-# Initialize extensions
-mysql = MySQL(app)
-csrf = CSRFProtect(app)
+# Extensions and routes are bound to an app in create_app()
+mysql = MySQLPool()
+csrf = CSRFProtect()
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -86,7 +86,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if not session.get('brycegayan_username'):
             flash('Please log in to access this page', 'error')
-            return redirect(url_for('enterLogin'))
+            return redirect(url_for('.enterLogin'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -99,10 +99,42 @@ def handle_errors(f):
         except Exception as e:
             logger.error(f"Error in {f.__name__}: {str(e)}")
             flash('An error occurred. Please try again.', 'error')
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
     return decorated_function
 
-@app.route('/test_db')
+@bp.after_app_request
+def addQueryTimings(response):
+    # per-request query count and DB time, so N+1 patterns show up in the browser's network tab
+    if current_app.config['DB_TIMING_HEADERS'] and 'dbQueries' in g:
+        response.headers['X-DB-Queries'] = str(g.dbQueries)
+        response.headers['Server-Timing'] = f'db;dur={g.dbSeconds * 1000:.1f};desc="{g.dbQueries} queries"'
+    return response
+
+
+@bp.route('/metrics')
+def metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    text = prometheusText(state().queryStats, mysql.pool)
+    text += f"# TYPE nfl_live_subscribers gauge\nnfl_live_subscribers {state().livePoller.subscribers()}\n"
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/live')
+def live():
+    # server-sent score updates; every client shares this process's single poller
+    if not session.get('brycegayan_username'):
+        abort(401)
+    livePoller = state().livePoller
+    subscription = livePoller.subscribe(request.headers.get('Last-Event-ID'))
+    if subscription is None:
+        # this worker's streams are all taken, the page falls back to polling /api/matchups
+        return Response('Too many live streams', status=503, headers={'Retry-After': str(int(livePoller.interval))})
+    return Response(livePoller.stream(subscription, heartbeat=current_app.config['LIVE_HEARTBEAT']),
+                    mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@bp.route('/test_db')
 def test_db():
     try:
         cur = mysql.connection.cursor()
@@ -114,60 +146,56 @@ def test_db():
         logger.error(f"Database test failed: {str(e)}")
         return "Database connection failed", 500
 
-@app.route('/')
+@bp.route('/')
 @handle_errors
 def index():
     error = getErrorMessage(request.values.get('error'))
-    scorePredictions()
     if not session.get('brycegayan_username'):
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
     cursor = mysql.connection.cursor()
-    data = loadData()
+    board = loadData()
     id = getUserID()
     # get number of predictions made or if submitted
     submittedPredictions = select(
-        cursor, 'SELECT * FROM brycegayan_predictions WHERE user_id=%s AND week=%s', (id, getWeek(data)))
+        cursor, 'SELECT * FROM brycegayan_predictions WHERE user_id=%s AND season=%s AND season_type=%s AND week=%s', (id, *weekKey(board)))
     if len(submittedPredictions) > 0:
         status = 'Predictions Submitted'
     else:
         savedPredictions = select(
-            cursor, 'SELECT * FROM brycegayan_savedpredictions WHERE user_id=%s AND week=%s', (id, getWeek(data)))
-        status = str(len(savedPredictions)) + '/' + \
-            str(len(data['sports'][0]['leagues'][0]['events']))
+            cursor, 'SELECT * FROM brycegayan_savedpredictions WHERE user_id=%s AND week=%s', (id, board.week))
+        status = str(len(savedPredictions)) + '/' + str(len(board))
 
     # get leagues, places in leagues
     leagues = getLeagues()
-    # leagueNames = [None]*len(leagues)
-    places = [None] * len(leagues)
-    for i in range(len(leagues)):
-        places[i] = getPlace(cursor, id, leagues[i]['league_id'])
+    leaguePlaces = getLeaguePlaces(cursor, id, getScoringVersion(cursor), leagues)
+    places = [leaguePlaces.get(league['league_id']) for league in leagues]
 
-    return render_template('index.html.j2', status=status, leagues=getLeagues(), places=places, active={'home': ' active', 'predict': ''}, current={'home': 'aria-current="page"', 'predict': ''}, error=error)
+    return render_template('index.html.j2', status=status, leagues=leagues, places=places, active={'home': ' active', 'predict': ''}, current={'home': 'aria-current="page"', 'predict': ''}, error=error)
 
 
-@app.route('/log-in')
+@bp.route('/log-in')
 def enterLogin():
     error = getErrorMessage(request.values.get('error'))
     return render_template('login.html.j2',  active={'home': '', 'predict': ''}, current={'home': '', 'predict': ''}, error=error)
 
 
-@app.route('/sign-up')
+@bp.route('/sign-up')
 def signup():
     error = getErrorMessage(request.values.get('error'))
     return render_template('signup.html.j2',  active={'home': '', 'predict': ''}, current={'home': '', 'predict': ''}, error=error)
 
 
-@app.route('/log-out')
+@bp.route('/log-out')
 def logout():
     session.clear()
     flash('You have been logged out successfully', 'success')
-    return redirect(url_for('enterLogin'))
+    return redirect(url_for('.enterLogin'))
 
 # Check if username and password are valid. If valid, log user in with their new credentials.
 
 
-@app.route('/sign-up-verification', methods=['POST'])
+@bp.route('/sign-up-verification', methods=['POST'])
 @handle_errors
 def signupVerification():
     user = request.values.get('username')
@@ -177,12 +205,12 @@ def signupVerification():
     username_valid, username_error = validate_username(user)
     if not username_valid:
         flash(username_error, 'error')
-        return redirect(url_for('signup'))
+        return redirect(url_for('.signup'))
     
     password_valid, password_error = validate_password(pwd)
     if not password_valid:
         flash(password_error, 'error')
-        return redirect(url_for('signup'))
+        return redirect(url_for('.signup'))
 
     cursor = mysql.connection.cursor()
 
@@ -190,15 +218,15 @@ def signupVerification():
         cursor, "SELECT * FROM brycegayan_users WHERE username=%s", (user.strip(),))
     if len(data) > 0:  # if this username already exists
         flash('Username already taken', 'error')
-        return redirect(url_for('signup'))
+        return redirect(url_for('.signup'))
 
     insert(cursor, "INSERT INTO brycegayan_users(username, password) VALUES (%s, %s)",
            (user.strip(), generate_password_hash(pwd)))
     flash('Account created successfully!', 'success')
-    return login(user.strip())
+    return login(user.strip(), cursor.lastrowid)
 
 
-@app.route('/log-in-verification', methods=['POST'])
+@bp.route('/log-in-verification', methods=['POST'])
 @handle_errors
 def loginVerification():
     user = request.values.get('username')
@@ -206,25 +234,25 @@ def loginVerification():
 
     if not user or not pwd:
         flash('Please enter both username and password', 'error')
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
     cursor = mysql.connection.cursor()
     data = select(
-        cursor, "SELECT password FROM brycegayan_users WHERE username=%s", (user.strip(),))
+        cursor, "SELECT id, password FROM brycegayan_users WHERE username=%s", (user.strip(),))
     if len(data) == 0:  # if there are no matching usernames
         flash('Invalid username or password', 'error')
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
     # if passwords don't match
     if not check_password_hash(data[0]['password'], pwd):
         flash('Invalid username or password', 'error')
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
     flash('Login successful!', 'success')
-    return login(user.strip())
+    return login(user.strip(), data[0]['id'])
 
 
-@app.route('/create-league')
+@bp.route('/create-league')
 @login_required
 @handle_errors
 def createLeague():
@@ -235,12 +263,12 @@ def createLeague():
     name_valid, name_error = validate_league_name(name)
     if not name_valid:
         flash(name_error, 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     code_valid, code_error = validate_league_code(code)
     if not code_valid:
         flash(code_error, 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     # check that code is unique
     cursor = mysql.connection.cursor()
@@ -248,16 +276,16 @@ def createLeague():
         cursor, "SELECT * FROM brycegayan_leagues WHERE join_code=%s", (code.strip().upper(),))
     if len(data) > 0:
         flash('League code already taken', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     # insert league into leagues
     insert(cursor, "INSERT INTO brycegayan_leagues(name, join_code) VALUES (%s,%s)", (name.strip(), code.strip().upper()))
     flash('League created successfully!', 'success')
     # add user to league
-    return redirect(url_for('joinLeague') + '?leagueCode=' + code.strip().upper())
+    return redirect(url_for('.joinLeague') + '?leagueCode=' + code.strip().upper())
 
 
-@app.route('/join-league')
+@bp.route('/join-league')
 @login_required
 @handle_errors
 def joinLeague():
@@ -265,7 +293,7 @@ def joinLeague():
     
     if not leagueCode:
         flash('Please enter a league code', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     # checks if there is a league with this code
     cursor = mysql.connection.cursor()
@@ -273,7 +301,7 @@ def joinLeague():
         cursor, "SELECT * FROM brycegayan_leagues WHERE join_code=%s", (leagueCode.strip().upper(),))
     if len(data) == 0:
         flash('No league found with this code', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     # checks if user is already in league
     # data[0]['id'] is the league_id from above
@@ -281,141 +309,283 @@ def joinLeague():
         cursor, "SELECT * FROM brycegayan_users_leagues WHERE user_id=%s AND league_id=%s", (getUserID(), data[0]['id']))
     if len(results) > 0:
         flash('You are already in this league', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     # inserts relationship into users_leagues
     insert(cursor, "INSERT INTO brycegayan_users_leagues(user_id, league_id) VALUES (%s,%s)",
            (getUserID(), data[0]['id']))
+    g.pop('leagues', None)
+    # the new version retires this league's cached fragments in every worker
+    insert(cursor, "UPDATE brycegayan_leagues SET version = version + 1 WHERE id=%s", (data[0]['id'],))
 
     flash('Successfully joined the league!', 'success')
     # redirects back to homepage
-    return redirect(url_for('league') + '?id=' + str(data[0]['id']))
+    return redirect(url_for('.league') + '?id=' + str(data[0]['id']))
 
 
-@app.route('/predict')
+@bp.route('/predict')
 @login_required
 @handle_errors
 def makePredictions():
     error = getErrorMessage(request.values.get('error'))
     # Checks that there is a user logged in
     if not session.get('brycegayan_username'):
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
-    data = loadData()
-    if weekStarted(data):
+    board = loadData()
+    if board.started:
         flash('You may no longer make predictions for this week', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
     query = 'SELECT team1, score1, team2, score2 FROM brycegayan_savedpredictions WHERE user_id=%s'
     predictions = select(mysql.connection.cursor(), query, (getUserID(),))
-    matchups = getMatchups(data)
-    indexedPredictions = [['' for i in range(4)] for j in range(len(matchups))]
+    indexedPredictions = [['' for i in range(4)] for j in range(len(board))]
     # This part is necessary for autocompleting saved predictions in the form
     for prediction in predictions:
-        if [prediction['team1'], prediction['team2']] in matchups:
-            indexedPredictions[matchups.index(
-                [prediction['team1'], prediction['team2']])] = list(prediction.values())
+        i = board.gameIndex.get((prediction['team1'], prediction['team2']))
+        if i is not None:
+            indexedPredictions[i] = list(prediction.values())
 
-    return render_template('predictions.html.j2', matchups=getMatchups(loadData()), savedPredictions=indexedPredictions, leagues=getLeagues(), active={'home': '', 'predict': ' active'}, current={'home': '', 'predict': 'aria-current="page"'}, error=error)
+    return render_template('predictions.html.j2', matchups=board.matchups, savedPredictions=indexedPredictions, leagues=getLeagues(), active={'home': '', 'predict': ' active'}, current={'home': '', 'predict': 'aria-current="page"'}, error=error)
 
 
-@app.route('/enter-predictions')
+@bp.route('/enter-predictions')
 @login_required
 @handle_errors
 def enterPredictions():
-    data = loadData()
-    if weekStarted(data):
+    board = loadData()
+    if board.started:
         flash('You may no longer make predictions for this week', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
 
-    teams = getMatchups(data)
-    predictions = [['' for i in range(2)] for j in range(len(teams))]
     submit = request.values.get('submit')
+    userID = getUserID()
     cursor = mysql.connection.cursor()
 
     # Check if trying to submit over previous submission
     if submit:
         results = select(
-            cursor, 'SELECT * FROM brycegayan_predictions WHERE user_id=%s AND week=%s', (getUserID(), getWeek(data)))
+            cursor, 'SELECT * FROM brycegayan_predictions WHERE user_id=%s AND season=%s AND season_type=%s AND week=%s', (userID, *weekKey(board)))
         if len(results) > 0:
             flash('You have already submitted predictions for this week', 'error')
-            return redirect(url_for('index'))
-
-    # Add predictions to list and validate
-    for i in range(len(teams)):
-        predictions[i][0] = request.values.get(teams[i][0])
-        predictions[i][1] = request.values.get(teams[i][1])
-        
-        # Validate scores
-        score1_valid, score1_error = validate_score(predictions[i][0])
-        score2_valid, score2_error = validate_score(predictions[i][1])
-        
+            return redirect(url_for('.index'))
+
+    # Validate the whole slate before anything is written
+    predictions = []
+    for team1, team2 in board.matchups:
+        score1 = request.values.get(team1)
+        score2 = request.values.get(team2)
+
+        score1_valid, score1_error = validate_score(score1)
+        score2_valid, score2_error = validate_score(score2)
+
         if not score1_valid or not score2_valid:
             flash('Please enter valid scores (0-999) for all games', 'error')
-            return redirect(url_for('makePredictions'))
-        
-        # enter to database
-        if not submit:  # save
-            # remove any prior saved predictions for this game
-            query = 'DELETE FROM brycegayan_savedpredictions WHERE user_id=%s AND team1=%s AND week=%s'
-            cursor.execute(
-                query, (getUserID(), teams[i][0], getWeek(data)))
-            mysql.connection.commit()
-            # insert prediction
-            query = "INSERT INTO brycegayan_savedpredictions(user_ID, team1, score1, team2, score2, week) VALUES (%s,%s,%s,%s,%s,%s)"
-            queryVars = (getUserID(
-            ), teams[i][0], predictions[i][0], teams[i][1], predictions[i][1], getWeek(data))
-            insert(cursor, query, queryVars)
+            return redirect(url_for('.makePredictions'))
+        predictions.append((userID, team1, int(score1), team2, int(score2), board.week))
 
+    # enter to database, one statement and one commit for the whole slate
     if submit:
-        for i in range(len(teams)):
-            # insert prediction
-            query = "INSERT INTO brycegayan_predictions(user_ID, team1, score1, team2, score2, week) VALUES (%s,%s,%s,%s,%s,%s)"
-            queryVars = (getUserID(), teams[i][0], predictions[i]
-                         [0], teams[i][1], predictions[i][1], getWeek(data))
-            insert(cursor, query, queryVars)
+        # submissions record their season and season type, postseason weeks are numbered from 1 again
+        query = "INSERT INTO brycegayan_predictions(user_id, team1, score1, team2, score2, week, season, season_type) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)"
+        try:
+            insertMany(cursor, query, [(*prediction, board.season or 0, board.seasonType) for prediction in predictions])
+        except MySQLdb.IntegrityError:
+            # a concurrent submit for the same week got there first
+            flash('You have already submitted predictions for this week', 'error')
+            return redirect(url_for('.index'))
         flash('Predictions submitted successfully!', 'success')
+    else:  # save, replacing any prior saved predictions for these games
+        query = "INSERT INTO brycegayan_savedpredictions(user_id, team1, score1, team2, score2, week) VALUES (%s,%s,%s,%s,%s,%s) ON DUPLICATE KEY UPDATE team2=VALUES(team2), score1=VALUES(score1), score2=VALUES(score2)"
+        insertMany(cursor, query, predictions)
 
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
 
-@app.route('/league')
+@bp.route('/league')
 @login_required
 @handle_errors
 def league():
     # Checks that there is a user logged in
     if not session.get('brycegayan_username'):
-        return redirect(url_for('enterLogin'))
+        return redirect(url_for('.enterLogin'))
 
     id = request.values.get('id')
     if not id or not id.isdigit():
         flash('Invalid league ID', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
+    page = request.values.get('page', '1')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+
     cursor = mysql.connection.cursor()
-    data = loadData()
-    info = None
-    members = None
-    numMatchups = None
-    nameQuery = "SELECT name FROM brycegayan_leagues WHERE id=%s"
+    board = loadData()
+    league = getLeague(cursor, id)
+    if league is None:
+        flash('Invalid league ID', 'error')
+        return redirect(url_for('.index'))
+    leagues = getLeagues()
 
-    # get info for table if week has already started (don't want users to be able to see each other's predictions until week starts for competitive integrity)
-    if weekStarted(data):
-        infoQuery = "SELECT u.username, p.team1, p.score1, p.team2, p.score2, u.score FROM brycegayan_users u JOIN brycegayan_predictions p JOIN brycegayan_users_leagues r ON r.league_id=%s AND u.id=r.user_id AND u.id=p.user_id AND p.week=%s ORDER BY u.username"
-        memberQuery = "SELECT u.username FROM brycegayan_users u JOIN brycegayan_users_leagues r ON r.league_id=%s AND u.id=r.user_id ORDER BY u.username;"
-        info = select(cursor,  infoQuery, (id, getWeek(data)))
-        members = select(cursor, memberQuery, (id,))
-        numMatchups = int(len(getMatchups(data)))
+    # standings and the grid only change when a week is scored or someone joins, so they are shared by every viewer
+    key = cacheKey('league', int(id), *weekKey(board), board.started, league['scoringVersion'], league['version'], page)
+    # until the week is sealed the standings include only the games that have finished so far
+    completed = tuple(game.completed for game in board.games)
+    final = sum(completed)
+    provisional = board.started and (league['recentSeason'], league['recentSeasonType'], league['recentWeek']) != weekKey(board)
+    # the live badge changes as games end, before the worker scores them and bumps scoringVersion
+    etag = hashlib.sha1(repr((key, getUserID(), [l['league_id'] for l in leagues], completed, provisional)).encode()).hexdigest()
+    lastModified = max(league['updated_at'], league['scored_at'])
+    conditional = not session.get('_flashes')  # pages carrying a flash message are one-offs
+    if conditional and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    fragments = state().store.get(key)
+    if fragments is None:
+        standings = getStandings(cursor, id)
+
+        # get one page of the predictions grid if week has already started (don't want users to be able to see each other's predictions until week starts for competitive integrity)
+        grid = None
+        pageSize = current_app.config['LEAGUE_PAGE_SIZE']
+        pages = max(1, -(-len(standings) // pageSize))
+        if board.started:
+            grid = getPredictionGrid(cursor, id, board, min(page, pages), pageSize)
+        fragments = {
+            'standings': Markup(render_template('league_standings.html.j2', standings=standings)),
+            'grid': Markup(render_template('league_grid.html.j2', leagueID=id, matchups=board.matchups, grid=grid, page=min(page, pages), pages=pages)),
+        }
+        state().store.set(key, fragments)
+
+    # flashes are read up front, the session can't change once the page starts streaming
+    get_flashed_messages(with_categories=True)
+    response = current_app.response_class(stream_template('league.html.j2', name=league['name'], fragments=fragments, leagues=leagues,
+                                                  provisional=provisional, final=final, games=len(board), active={'home': '', 'predict': ''}, current={'home': '', 'predict': ''}))
+    if conditional:
+        response.set_etag(etag)
+        response.last_modified = lastModified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+
+# Read-only JSON API. Bodies are serialized once per version key into the shared store and
+# revalidated with strong ETags, so a polling client mostly gets 304s
+@bp.route('/api/matchups')
+def apiMatchups():
+    # the schedule is public: no login, and shared caches may keep it until kickoff
+    board = loadData()
+    games = [dict(gameData(game), date=game.date) for game in board.games]
+    key = cacheKey('api-matchups', *weekKey(board), hashlib.sha1(repr(games).encode()).hexdigest())
+    build = lambda: {'season': board.season, 'seasonType': board.seasonType, 'week': board.week,  # noqa: E731
+                     'started': board.started, 'games': games}
+    # once games are live the scores change, so every use is revalidated
+    return cachedJSON(key, build, public=True, maxAge=0 if board.started else current_app.config['API_MAX_AGE'])
+
+
+@bp.route('/api/ranks')
+def apiRanks():
+    # the logged in user's place in each of their leagues
+    if not session.get('brycegayan_username'):
+        return apiError(401, 'Please log in')
+    cursor = mysql.connection.cursor()
+    userID = getUserID()
+    leagues = getLeagues()
+    scoringVersion = getScoringVersion(cursor)
+    key = cacheKey('api-ranks', userID, scoringVersion, *(league['league_id'] for league in leagues))
 
-    # get standings
-    standings = getStandings(cursor, id)
+    def build():
+        places = getLeaguePlaces(cursor, userID, scoringVersion, leagues)
+        return {'scoringVersion': scoringVersion,
+                'leagues': [{'id': league['league_id'], 'name': league['name'], 'place': places.get(league['league_id'])}
+                            for league in leagues]}
+    return cachedJSON(key, build)
 
-    return render_template('league.html.j2', name=select(cursor, nameQuery, (id,))[0]['name'], info=info, members=members, numMatchups=numMatchups, standings=standings, leagues=getLeagues(), active={'home': '', 'predict': ''}, current={'home': '', 'predict': ''})
+
+@bp.route('/api/leagues/<int:leagueID>/standings')
+def apiStandings(leagueID):
+    if not session.get('brycegayan_username'):
+        return apiError(401, 'Please log in')
+    cursor = mysql.connection.cursor()
+    league = getLeague(cursor, leagueID)
+    if league is None:
+        return apiError(404, 'No league with this ID')
+    key = cacheKey('api-standings', leagueID, league['scoringVersion'], league['version'])
+    build = lambda: {  # noqa: E731
+        'league': {'id': leagueID, 'name': league['name']}, 'scoringVersion': league['scoringVersion'],
+        'standings': [{'place': row['place'], 'username': row['username'], 'score': row['score']}
+                      for row in getStandings(cursor, leagueID)]}
+    return cachedJSON(key, build)
+
+
+@bp.route('/api/leagues/<int:leagueID>/picks')
+def apiPicks(leagueID):
+    # everyone's picks for the current week, one page of members at a time, only once the week has kicked off
+    if not session.get('brycegayan_username'):
+        return apiError(401, 'Please log in')
+    board = loadData()
+    if not board.started:
+        return apiError(403, 'Picks are hidden until the week kicks off')
+    page = request.values.get('page', '1')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+    cursor = mysql.connection.cursor()
+    league = getLeague(cursor, leagueID)
+    if league is None:
+        return apiError(404, 'No league with this ID')
+    # picks can't change after kickoff, only the members can
+    key = cacheKey('api-picks', leagueID, *weekKey(board), league['version'], page)
+
+    def build():
+        pageSize = current_app.config['LEAGUE_PAGE_SIZE']
+        members = select(cursor, 'SELECT COUNT(*) AS members FROM brycegayan_users_leagues WHERE league_id=%s', (leagueID,))[0]['members']
+        return {'league': {'id': leagueID, 'name': league['name']}, 'season': board.season, 'seasonType': board.seasonType, 'week': board.week,
+                'page': page, 'pages': max(1, -(-members // pageSize)), 'games': board.matchups,
+                'rows': getPredictionGrid(cursor, leagueID, board, page, pageSize)}
+    return cachedJSON(key, build)
+
+
+def cachedJSON(key, build, public=False, maxAge=0):
+    """A JSON response for a cache key naming every version its body depends on.
+
+    The same key always serializes to the same body, so its hash is a strong ETag and a
+    matching If-None-Match gets a 304 without building or loading the body at all.
+    """
+    etag = hashlib.sha1(key.encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = state().store.get(key)
+        if body is None:
+            body = json.dumps(build(), separators=(',', ':'))
+            state().store.set(key, body)
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    if maxAge:
+        response.cache_control.max_age = maxAge
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def apiError(status, message):
+    return jsonify({'error': message}), status
+
+
+def execute(cursor, query, queryVars=None):
+    return timedExecute(state().queryStats, cursor, query, queryVars)
+
+
+def executeMany(cursor, query, rows):
+    return timedExecute(state().queryStats, cursor, query, rows, many=True)
 
 
 def select(cursor, query, queryVars):
     try:
-        cursor.execute(query, queryVars)
+        execute(cursor, query, queryVars)
         mysql.connection.commit()
         return cursor.fetchall()
     except Exception as e:
@@ -426,7 +596,7 @@ def select(cursor, query, queryVars):
 
 def insert(cursor, query, queryVars):
     try:
-        cursor.execute(query, queryVars)
+        execute(cursor, query, queryVars)
         mysql.connection.commit()
     except Exception as e:
         logger.error(f"Database insert error: {str(e)}")
@@ -434,154 +604,415 @@ def insert(cursor, query, queryVars):
         raise
 
 
-def loadData():
+def insertMany(cursor, query, rows):
+    # executemany folds an INSERT into a single multi-row statement, committed once
     try:
-        response = requests.get(
-            'https://site.web.api.espn.com/apis/v2/scoreboard/header?sport=football&league=nfl', timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        logger.error(f"ESPN API error: {str(e)}")
+        executeMany(cursor, query, rows)
+        mysql.connection.commit()
+    except Exception as e:
+        logger.error(f"Database insert error: {str(e)}")
+        mysql.connection.rollback()
         raise
 
 
-def getMatchups(data):
-    # set up a numGamesx2 array (from Geeks4Geeks)
-    matchups = [['' for i in range(2)] for j in range(
-        len(data['sports'][0]['leagues'][0]['events']))]
-    for i in range(len(data['sports'][0]['leagues'][0]['events'])):
-        matchups[i][0] = data['sports'][0]['leagues'][0]['events'][i]['competitors'][0]['abbreviation']
-        matchups[i][1] = data['sports'][0]['leagues'][0]['events'][i]['competitors'][1]['abbreviation']
-    return matchups
+def loadData():
+    return state().scoreboardCache.get()
+
+
+def weekKey(board):
+    # ESPN restarts week at 1 for the postseason, a week is only unique with its season and season type
+    return (board.season or 0, board.seasonType, board.week)
 
 
-def getScores(data):
-    # set up a numGamesx2 array (from Geeks4Geeks)
-    scores = [['' for i in range(2)] for j in range(
-        len(data['sports'][0]['leagues'][0]['events']))]
-    for i in range(len(data['sports'][0]['leagues'][0]['events'])):
-        scores[i][0] = int(data['sports'][0]['leagues'][0]
-                           ['events'][i]['competitors'][0]['score'])
-        scores[i][1] = int(data['sports'][0]['leagues'][0]
-                           ['events'][i]['competitors'][1]['score'])
-    return scores
+def state():
+    return current_app.extensions['nfl']
 
 
-def getWeek(data):
-    return data['sports'][0]['leagues'][0]['events'][0]['week']
+SCORING_LOCK = 'brycegayan_scoring'
 
 
 def getUserID():
-    return select(mysql.connection.cursor(), 'SELECT id FROM brycegayan_users WHERE username=%s', (session['brycegayan_username'],))[0]['id']
+    # resolved once at login and kept in the session, sessions from before that are backfilled here
+    if not session.get('brycegayan_user_id'):
+        session['brycegayan_user_id'] = select(mysql.connection.cursor(), 'SELECT id FROM brycegayan_users WHERE username=%s', (session['brycegayan_username'],))[0]['id']
+    return session['brycegayan_user_id']
 
 
-def login(user):
+def login(user, userID):
+    # both are overwritten together so the cached id always belongs to the logged in account
     session['brycegayan_username'] = user
+    session['brycegayan_user_id'] = userID
     session.permanent = True
-    return redirect(url_for('index'))
+    return redirect(url_for('.index'))
 
 
 def scorePredictions():
+    # scores games as they go final and seals the week once every game is; returns True if anything was scored
+    cursor = None
     try:
-        data = loadData()
+        board = loadData()
+        completed = [game for game in board.games if game.completed]
+        if not completed:
+            return False
         cursor = mysql.connection.cursor()
-        weekUpdated = select(
-            cursor, "SELECT * FROM brycegayan_info", ())[0]['recentWeek']
-
-        # conditions for scoring a week's predictions
-        if weekUpdated != getWeek(data) and weekFinished(data):
-            users = select(cursor, "SELECT * from brycegayan_users", ())
-            scores = getScores(data)
-            for user in users:  # scoring each user in each league.
-                weekScore = 0
-                predictions = select(
-                    cursor, 'SELECT * FROM brycegayan_predictions WHERE user_id = %s AND week = %s ORDER BY id', (user['id'], getWeek(data)))
-                if len(predictions) > 0:  # ensuring the user submitted predictions for this week
-                    for i in range(len(scores)):  # Scoring each prediction for the user
-                        # WINNER SCORING
-                        # if user correctly predicted winner or tie
-                        if (scores[i][0] > scores[i][1] and int(predictions[i]['score1']) > int(predictions[i]['score2'])) or (scores[i][0] < scores[i][1] and int(predictions[i]['score1']) < int(predictions[i]['score2'])) or (scores[i][0] == scores[i][1] and int(predictions[i]['score1']) == int(predictions[i]['score2'])):
-                            weekScore += 10
-                        # if game tied and user didn't predict a tie
-                        elif scores[i][0] == scores[i][1]:
-                            weekScore += 5
-                        # else user incorrectly predicted winner and they get 0 points
-
-                        # SPREAD SCORING
-                        actual = abs(scores[i][0] - scores[i][1])
-                        predicted = abs(
-                            int(predictions[i]['score1']) - int(predictions[i]['score2']))
-                        difference = abs(actual - predicted)
-                        if (difference < 10):
-                            weekScore += (10 - difference)
-                        # else user gets 0 points for spread because their prediction wasn't very good
-
-                        # POINTS SCORING
-                        actual = scores[i][0] + scores[i][1]
-                        predicted = int(
-                            predictions[i]['score1']) + int(predictions[i]['score2'])
-                        difference = abs(actual - predicted)
-                        if (difference < 16):
-                            weekScore += 8 - 0.5*difference
-                        # else user gets 0 points for points because their prediction wasn't very good
-
-                        # PERFECT GAME
-                        if scores[i][0] == int(predictions[i]['score1']) and scores[i][1] == int(predictions[i]['score2']):
-                            weekScore += 50
-
-                # add weekscore to the score for each of the user's leagues
-                query = 'UPDATE brycegayan_users_leagues SET score = score + %s WHERE user_id = %s'
-                cursor.execute(query, (weekScore, user['id']))
-                mysql.connection.commit()
-
-            # update weekUpdated so that website knows not to score predictions again for this week
-            query = 'UPDATE brycegayan_info SET recentWeek = %s WHERE 1'
-            cursor.execute(query, (str(getWeek(data)),))
-            mysql.connection.commit()
-            # clears unneccessary memory from database
-            cursor.execute('DELETE FROM brycegayan_savedpredictions WHERE 1')
+        # only one worker scores at a time, the others skip this round
+        with scoringLock(cursor) as locked:
+            if not locked:
+                return False
+            info = select(cursor, "SELECT recentSeason, recentSeasonType, recentWeek FROM brycegayan_info", ())[0]
+            if (info['recentSeason'], info['recentSeasonType'], info['recentWeek']) == weekKey(board):
+                return False  # already sealed
+
+            scored = {(row['team1'], row['team2']): (row['score1'], row['score2']) for row in select(
+                cursor, """SELECT team1, team2, score1, score2 FROM brycegayan_scored_games
+                    WHERE season = %s AND season_type = %s AND week = %s""", weekKey(board))}
+            # a final score that changed after it was scored (a stat correction) rescores the whole week
+            corrected = any(scored.get((game.team1, game.team2), (game.score1, game.score2)) != (game.score1, game.score2)
+                            for game in completed)
+            newGames = [game for game in completed if (game.team1, game.team2) not in scored]
+            if corrected:
+                scoreBoard(cursor, board)
+            elif newGames:
+                scoreGames(cursor, board, newGames)
+            if board.finished:
+                sealWeek(cursor, *weekKey(board))
+            return corrected or bool(newGames) or board.finished
     except Exception as e:
         logger.error(f"Error in scorePredictions: {str(e)}")
+    return False
 
 
-def weekFinished(data):  # true if every game is completed
-    for event in data['sports'][0]['leagues'][0]['events']:
-        if not event['fullStatus']['type']['completed']:
-            return False
-    return True
+@contextmanager
+def scoringLock(cursor, timeout=0):
+    # named MySQL lock shared by every process that writes scores, yields whether it was acquired
+    locked = select(cursor, "SELECT GET_LOCK(%s, %s) AS acquired", (SCORING_LOCK, timeout))[0]['acquired'] == 1
+    try:
+        yield locked
+    finally:
+        if locked:
+            try:
+                select(cursor, "SELECT RELEASE_LOCK(%s)", (SCORING_LOCK,))
+            except Exception as e:
+                logger.error(f"Could not release scoring lock: {str(e)}")
+
+
+def scoreBoard(cursor, board):
+    # scores every completed game of the week from scratch, replacing what the ledger held for it
+    rows = select(cursor, '''SELECT user_id, team1, team2, score1, score2 FROM brycegayan_predictions
+        WHERE season = %s AND season_type = %s AND week = %s''', weekKey(board))
+    if not rows:
+        # weeks before the last sealed one have moved to the archive
+        rows = select(cursor, '''SELECT user_id, team1, team2, score1, score2 FROM brycegayan_predictions_archive
+            WHERE season = %s AND season_type = %s AND week = %s''', weekKey(board))
+    userIds, picks1, picks2, submitted = predictionArrays(rows, board.gameIndex)
+    completed = [game.completed for game in board.games]
+    weekScores = scoreWeek(picks1, picks2, submitted & completed, board.scores1, board.scores2)
+    games = [game for game in board.games if game.completed]
+    return applyWeekScores(cursor, *weekKey(board), userIds.tolist(), weekScores.tolist(), games)
+
+
+def scoreGames(cursor, board, games):
+    # scores only the predictions for games that just went final and adds them to the week's ledger entries
+    placeholders = ','.join(['%s'] * len(games))
+    rows = select(cursor, f"""SELECT user_id, team1, team2, score1, score2 FROM brycegayan_predictions
+        WHERE season = %s AND season_type = %s AND week = %s AND team1 IN ({placeholders})""",
+                  (*weekKey(board), *(game.team1 for game in games)))
+    gameIndex = {(game.team1, game.team2): i for i, game in enumerate(games)}
+    userIds, picks1, picks2, submitted = predictionArrays(rows, gameIndex)
+    gameScores = scoreWeek(picks1, picks2, submitted, [game.score1 for game in games], [game.score2 for game in games])
+    return applyWeekScores(cursor, *weekKey(board), userIds.tolist(), gameScores.tolist(), games, additive=True)
+
+
+def applyWeekScores(cursor, season, seasonType, week, userIds, weekScores, games, additive=False):
+    # records the week in the score ledger and moves every league standing by the difference from what the
+    # ledger held before, so scoring a week again only applies corrections. With additive the scores are
+    # points for the given games only and are added to the ledger instead of replacing it. games are recorded
+    # as scored. One transaction, either all of it is applied or none. Returns the number of standings changed.
+    try:
+        execute(
+            cursor, 'CREATE TEMPORARY TABLE IF NOT EXISTS brycegayan_week_scores (user_id INT PRIMARY KEY, score DECIMAL(6,1) NOT NULL)')
+        execute(
+            cursor, 'CREATE TEMPORARY TABLE IF NOT EXISTS brycegayan_week_deltas (user_id INT PRIMARY KEY, delta INT NOT NULL, scored_at TIMESTAMP NOT NULL)')
+        execute(cursor, 'DELETE FROM brycegayan_week_scores')
+        execute(cursor, 'DELETE FROM brycegayan_week_deltas')
+        executeMany(cursor, 'INSERT INTO brycegayan_week_scores(user_id, score) VALUES (%s, %s)',
+                    list(zip(userIds, weekScores)))
+
+        # standings hold whole points, each week total is rounded once so ledger sums always match them
+        newTotal = 'COALESCE(l.score, 0) + ws.score' if additive else 'ws.score'
+        execute(cursor, f"""INSERT INTO brycegayan_week_deltas(user_id, delta, scored_at)
+            SELECT ws.user_id, ROUND({newTotal}) - COALESCE(ROUND(l.score), 0), COALESCE(l.scored_at, CURRENT_TIMESTAMP)
+            FROM brycegayan_week_scores ws LEFT JOIN brycegayan_user_week_scores l
+                ON l.user_id = ws.user_id AND l.season = %s AND l.season_type = %s AND l.week = %s""", (season, seasonType, week))
+        if not additive:
+            # users scored before who no longer have predictions for the week lose those points
+            execute(cursor, """INSERT INTO brycegayan_week_deltas(user_id, delta, scored_at)
+                SELECT l.user_id, -ROUND(l.score), l.scored_at FROM brycegayan_user_week_scores l
+                WHERE l.season = %s AND l.season_type = %s AND l.week = %s
+                    AND l.user_id NOT IN (SELECT user_id FROM brycegayan_week_scores)""", (season, seasonType, week))
+
+        # only leagues the user was already in when the week was first scored count it
+        execute(cursor, """UPDATE brycegayan_users_leagues ul JOIN brycegayan_week_deltas d ON d.user_id = ul.user_id
+            SET ul.score = ul.score + d.delta WHERE d.delta <> 0 AND ul.created_at <= d.scored_at""")
+        changed = cursor.rowcount
+
+        newScore = 'score + VALUES(score)' if additive else 'VALUES(score)'
+        executeMany(cursor, f"""INSERT INTO brycegayan_user_week_scores(user_id, season, season_type, week, score) VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE score = {newScore}""",
+                    [(userID, season, seasonType, week, score) for userID, score in zip(userIds, weekScores)])
+        if not additive:
+            execute(cursor, """DELETE FROM brycegayan_user_week_scores WHERE season = %s AND season_type = %s AND week = %s
+                AND user_id NOT IN (SELECT user_id FROM brycegayan_week_scores)""", (season, seasonType, week))
+            execute(cursor, 'DELETE FROM brycegayan_scored_games WHERE season = %s AND season_type = %s AND week = %s',
+                    (season, seasonType, week))
+        executeMany(cursor, """INSERT INTO brycegayan_scored_games(season, season_type, week, team1, team2, score1, score2)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+                    [(season, seasonType, week, game.team1, game.team2, game.score1, game.score2) for game in games])
+
+        execute(cursor, 'UPDATE brycegayan_info SET scoringVersion = scoringVersion + 1 WHERE 1')
+        mysql.connection.commit()
+        return changed
+    except Exception as e:
+        logger.error(f"Database error applying week {week} scores: {str(e)}")
+        mysql.connection.rollback()
+        raise
+    finally:
+        execute(cursor, 'DROP TEMPORARY TABLE IF EXISTS brycegayan_week_scores')
+        execute(cursor, 'DROP TEMPORARY TABLE IF EXISTS brycegayan_week_deltas')
 
 
-def weekStarted(data):  # true if a game has begun
-    for event in data['sports'][0]['leagues'][0]['events']:
-        if event['status'] != "pre":
-            return True
-    return False
+def sealWeek(cursor, season, seasonType, week):
+    # every game is final and scored: the week's standings are no longer provisional
+    try:
+        # update weekUpdated so that website knows not to score predictions again for this week
+        execute(cursor, '''UPDATE brycegayan_info SET recentSeason = %s, recentSeasonType = %s, recentWeek = %s,
+            scoringVersion = scoringVersion + 1 WHERE 1''', (season, seasonType, week))
+        mysql.connection.commit()
+    except Exception as e:
+        logger.error(f"Database error sealing week {week}: {str(e)}")
+        mysql.connection.rollback()
+        raise
+    # drafts up to this week have expired and earlier weeks' predictions move to the archive, both in bounded
+    # batches so submissions for the coming week never wait on a table-wide lock
+    batchSize = current_app.config['ARCHIVE_BATCH_SIZE']
+    deleteInBatches(cursor, 'DELETE FROM brycegayan_savedpredictions WHERE week <= %s ORDER BY week, id', (week,), batchSize)
+    archivePredictions(cursor, season, seasonType, week, batchSize)
 
 
-def getLeagues():
-    query = 'SELECT ul.league_id, l.name FROM brycegayan_users_leagues ul JOIN brycegayan_leagues l ON ul.league_id=l.id WHERE ul.user_id=%s'
-    return select(mysql.connection.cursor(), query, (getUserID(),))
+def deleteInBatches(cursor, query, queryVars, batchSize):
+    # runs query with LIMIT batchSize, one transaction per batch, until nothing is left; returns the rows deleted
+    deleted = 0
+    while True:
+        try:
+            count = execute(cursor, f"{query} LIMIT %s", (*queryVars, batchSize))
+            mysql.connection.commit()
+        except Exception:
+            mysql.connection.rollback()
+            raise
+        deleted += count
+        if count < batchSize:
+            return deleted
+
+
+def archivePredictions(cursor, season, seasonType, week, batchSize):
+    # moves the predictions of every week before the just sealed one (which rescore-week may still need) into
+    # the archive, batchSize rows per transaction. Weeks are ordered by (season, season type, week).
+    archived = 0
+    while True:
+        ids = [row['id'] for row in select(cursor, """SELECT id FROM brycegayan_predictions
+            WHERE season < %s OR (season = %s AND season_type < %s) OR (season = %s AND season_type = %s AND week < %s)
+            LIMIT %s""", (season, season, seasonType, season, seasonType, week, batchSize))]
+        if not ids:
+            return archived
+        placeholders = ','.join(['%s'] * len(ids))
+        try:
+            execute(cursor, f"""INSERT INTO brycegayan_predictions_archive(id, season, season_type, user_id, team1, score1, team2, score2, week, created_at)
+                SELECT id, season, season_type, user_id, team1, score1, team2, score2, week, created_at
+                FROM brycegayan_predictions WHERE id IN ({placeholders})""", ids)
+            execute(cursor, f'DELETE FROM brycegayan_predictions WHERE id IN ({placeholders})', ids)
+            mysql.connection.commit()
+        except Exception as e:
+            logger.error(f"Database error archiving predictions: {str(e)}")
+            mysql.connection.rollback()
+            raise
+        archived += len(ids)
+        if len(ids) < batchSize:
+            return archived
+
+
+def standingMismatches(cursor):
+    # league standings whose score differs from their base score plus the ledger weeks scored since the user joined
+    query = """SELECT ul.id, ul.user_id, ul.league_id, ul.score, ul.base_score + COALESCE(SUM(ROUND(l.score)), 0) AS expected
+        FROM brycegayan_users_leagues ul LEFT JOIN brycegayan_user_week_scores l
+            ON l.user_id = ul.user_id AND l.scored_at >= ul.created_at
+        GROUP BY ul.id, ul.user_id, ul.league_id, ul.score, ul.base_score HAVING ul.score <> expected"""
+    return select(cursor, query, ())
+
+
+def runScoringWorker(app, interval, once=False):
+    # polls the scoreboard, scoring games as they finish and sealing each week once all have
+    while True:
+        with app.app_context():
+            if scorePredictions():
+                logger.info("Scored newly completed games")
+        if once:
+            return
+        time.sleep(interval)
+
+
+def startScoringWorker(app):
+    thread = threading.Thread(target=runScoringWorker, args=(
+        app, app.config['SCORING_INTERVAL']), name='scoring-worker', daemon=True)
+    thread.start()
+    return thread
+
+
+@bp.cli.command('score-worker')
+@click.option('--interval', type=int, default=None, help='Seconds between scoreboard polls (defaults to SCORING_INTERVAL)')
+@click.option('--once', is_flag=True, help='Run a single scoring pass and exit')
+def scoreWorkerCommand(interval, once):
+    """Run the weekly scoring worker"""
+    runScoringWorker(current_app._get_current_object(), interval or current_app.config['SCORING_INTERVAL'], once=once)
+
+
+@bp.cli.command('rescore-week')
+@click.argument('week', type=int)
+@click.option('--scoreboard', 'path', default=None,
+              help='Final scoreboard JSON or .nflarc archive for the week (defaults to the live scoreboard)')
+@click.option('--season-type', 'seasonType', type=int, default=REGULAR_SEASON,
+              help="ESPN season type of WEEK: 1 preseason, 2 regular season (default), 3 postseason")
+def rescoreWeekCommand(week, path, seasonType):
+    """Score WEEK's completed games again and apply the difference to every standing"""
+    board = loadScoreboardFile(path, week) if path else loadData()
+    if (board.seasonType, board.week) != (seasonType, week):
+        raise click.ClickException(f"Scoreboard is for season type {board.seasonType} week {board.week}, "
+                                   f"not season type {seasonType} week {week}")
+    cursor = mysql.connection.cursor()
+    with scoringLock(cursor, timeout=30) as locked:
+        if not locked:
+            raise click.ClickException('Scoring is running elsewhere, try again shortly')
+        changed = scoreBoard(cursor, board)
+    click.echo(f"Rescored season {board.season} week {week}, {changed} standings changed")
 
 
-def getStandings(cursor, leagueID):
-    unorderedStandings = select(
-        cursor, 'SELECT user_id, score FROM brycegayan_users_leagues WHERE league_id=%s', (leagueID,))
-    standingsList = [[None for i in range(3)] for j in range(
-        len(unorderedStandings))]
-    for i in range(len(standingsList)):
-        standingsList[i][0] = int(unorderedStandings[i]['score'])
-        standingsList[i][1] = int(unorderedStandings[i]['user_id'])
-        standingsList[i][2] = select(
-            cursor, 'SELECT username FROM brycegayan_users WHERE id=%s', (unorderedStandings[i]['user_id'],))[0]['username']
-    return sorted(standingsList, reverse=True)
+@bp.cli.command('verify-standings')
+@click.option('--rebuild', is_flag=True, help='Overwrite mismatched standings with the ledger totals')
+def verifyStandingsCommand(rebuild):
+    """Check every league standing against the score ledger"""
+    cursor = mysql.connection.cursor()
+    with scoringLock(cursor, timeout=30) as locked:
+        if not locked:
+            raise click.ClickException('Scoring is running elsewhere, try again shortly')
+        mismatches = standingMismatches(cursor)
+        for row in mismatches[:20]:
+            click.echo(f"user {row['user_id']} league {row['league_id']}: {row['score']} != {int(row['expected'])}")
+        if len(mismatches) > 20:
+            click.echo(f"... and {len(mismatches) - 20} more")
+        if rebuild and mismatches:
+            try:
+                executeMany(cursor, 'UPDATE brycegayan_users_leagues SET score = %s WHERE id = %s',
+                            [(int(row['expected']), row['id']) for row in mismatches])
+                execute(cursor, 'UPDATE brycegayan_info SET scoringVersion = scoringVersion + 1 WHERE 1')
+                mysql.connection.commit()
+            except Exception:
+                mysql.connection.rollback()
+                raise
+    click.echo(f"{len(mismatches)} standings {'rebuilt' if rebuild else 'out of sync with the ledger'}")
+    if mismatches and not rebuild:
+        sys.exit(1)
+
+
+@bp.cli.command('migrate')
+@click.option('--pending', is_flag=True, help='List pending migrations without applying them')
+@click.option('--mark-applied', 'markOnly', type=int, default=None,
+              help='Record migrations up to VERSION as applied without running them')
+def migrateCommand(pending, markOnly):
+    """Apply pending schema migrations from migrations/"""
+    if pending:
+        for version, name, path in pendingMigrations(mysql.connection.cursor()):
+            click.echo(f"{version:03d} {name}")
+        return
+    applied = migrate(mysql.connection, markOnly=markOnly)
+    for version, name in applied:
+        click.echo(f"{'Marked' if markOnly is not None else 'Applied'} {version:03d} {name}")
+    if not applied:
+        click.echo('Schema is up to date')
+
+
+def loadScoreboardFile(path, week):
+    if path.endswith('.nflarc'):
+        archive = SnapshotArchive(path)
+        weeks = archive.latestPerWeek()
+        if week not in weeks:
+            raise click.ClickException(f"{path} has no snapshot for week {week}")
+        return archive.scoreboard(weeks[week])
+    with open(path) as f:
+        return parseScoreboard(json.load(f))
+
+
+def getLeagues():
+    # memoized for the request only, one indexed query is cheaper than keeping every worker's copy current
+    if 'leagues' not in g:
+        query = 'SELECT ul.league_id, l.name FROM brycegayan_users_leagues ul JOIN brycegayan_leagues l ON ul.league_id=l.id WHERE ul.user_id=%s'
+        g.leagues = select(mysql.connection.cursor(), query, (getUserID(),))
+    return g.leagues
 
 
-def getPlace(cursor, userID, leagueID):
-    standingsList = getStandings(cursor, leagueID)
+def getLeague(cursor, leagueID):
+    # the league with the versions its cached pages are keyed on, None if there is no such league
+    query = """SELECT l.name, l.version, l.updated_at, i.recentSeason, i.recentSeasonType, i.recentWeek, i.scoringVersion,
+        i.updated_at AS scored_at FROM brycegayan_leagues l JOIN brycegayan_info i WHERE l.id=%s"""
+    leagues = select(cursor, query, (leagueID,))
+    return leagues[0] if leagues else None
 
-    for place in standingsList:
-        if place[1] == userID:
-            return standingsList.index(place) + 1
+
+def getStandings(cursor, leagueID):
+    # league members ordered by score, tied scores share a place
+    query = """SELECT u.username, ul.user_id, ul.score, RANK() OVER (ORDER BY ul.score DESC) AS place
+        FROM brycegayan_users_leagues ul JOIN brycegayan_users u ON u.id = ul.user_id
+        WHERE ul.league_id = %s ORDER BY ul.score DESC, u.username"""
+    return select(cursor, query, (leagueID,))
+
+
+def getPlaces(cursor, userID):
+    # the user's place in each of their leagues, keyed by league id
+    query = """SELECT ranked.league_id, ranked.place FROM (
+            SELECT ul.league_id, ul.user_id, RANK() OVER (PARTITION BY ul.league_id ORDER BY ul.score DESC) AS place
+            FROM brycegayan_users_leagues ul
+            JOIN brycegayan_users_leagues mine ON mine.league_id = ul.league_id AND mine.user_id = %s
+        ) ranked WHERE ranked.user_id = %s"""
+    return {row['league_id']: row['place'] for row in select(cursor, query, (userID, userID))}
+
+
+def getLeaguePlaces(cursor, userID, scoringVersion, leagues):
+    # getPlaces() through the shared store, until the next scoring run or a change in the user's leagues
+    key = cacheKey('places', userID, scoringVersion, *(league['league_id'] for league in leagues))
+    places = state().store.get(key)
+    if places is None:
+        places = getPlaces(cursor, userID)
+        state().store.set(key, places)
+    return places
+
+
+def getScoringVersion(cursor):
+    return select(cursor, "SELECT scoringVersion FROM brycegayan_info", ())[0]['scoringVersion']
+
+
+def getPredictionGrid(cursor, leagueID, board, page, pageSize):
+    # one row per member on the page, with a (score1, score2) pick or None for every game on the board
+    memberQuery = "SELECT u.id, u.username FROM brycegayan_users_leagues r JOIN brycegayan_users u ON u.id=r.user_id WHERE r.league_id=%s ORDER BY u.username LIMIT %s OFFSET %s"
+    members = select(cursor, memberQuery, (leagueID, pageSize, (page - 1) * pageSize))
+    if len(members) == 0:
+        return []
+    rows = {member['id']: {'username': member['username'], 'picks': [None] * len(board)} for member in members}
+    placeholders = ','.join(['%s'] * len(rows))
+    pickQuery = f"""SELECT user_id, team1, team2, score1, score2 FROM brycegayan_predictions
+        WHERE season=%s AND season_type=%s AND week=%s AND user_id IN ({placeholders})"""
+    for pick in select(cursor, pickQuery, (*weekKey(board), *rows)):
+        i = board.gameIndex.get((pick['team1'], pick['team2']))
+        if i is not None:
+            rows[pick['user_id']]['picks'][i] = (pick['score1'], pick['score2'])
+    return list(rows.values())
 
 
 def getErrorMessage(error):
@@ -606,10 +1037,60 @@ def getErrorMessage(error):
     return ''
 
 
+class AppState:
+    """Scoreboard, caches and live poller of one app, built by create_app()"""
+
+    def __init__(self, config):
+        self.queryStats = QueryStats(slowSeconds=config['SLOW_QUERY_MS'] / 1000)
+        # rendered league fragments and home page places; keys carry the scoring and league versions
+        # (and the user's league ids), so nothing has to be invalidated across workers when those change
+        self.store = makeStore(config['CACHE_BACKEND'], maxEntries=config['FRAGMENT_CACHE_SIZE'] * 4, ttl=config['CACHE_TTL'])
+        self.scoreboardSource = makeSource(
+            config['SCOREBOARD_SOURCE'], timeout=config['SCOREBOARD_TIMEOUT'], replayInterval=config['SCOREBOARD_REPLAY_INTERVAL'],
+            retries=config['SCOREBOARD_RETRIES'], failureThreshold=config['SCOREBOARD_BREAKER_THRESHOLD'],
+            resetAfter=config['SCOREBOARD_BREAKER_RESET'])
+        # every scoreboard that changed upstream is appended to the season archive when enabled
+        self.scoreboardArchive = ArchiveWriter(config['SCOREBOARD_ARCHIVE_DIR']) if config['SCOREBOARD_ARCHIVE_DIR'] else None
+        self.scoreboardCache = ScoreboardCache(
+            self.scoreboardSource.fetch, ttl=config['SCOREBOARD_CACHE_TTL'], staleTtl=config['SCOREBOARD_STALE_TTL'],
+            path=config['SCOREBOARD_CACHE_FILE'], onFetch=self.scoreboardArchive.capture if self.scoreboardArchive else None)
+        self.livePoller = LivePoller(lambda: self.scoreboardCache.get(), interval=config['LIVE_POLL_INTERVAL'],
+                                     maxSubscribers=config['LIVE_MAX_STREAMS'])
+
+
+def create_app(configName=None):
+    """Build the app for a config.py environment (FLASK_ENV, default development)"""
+    app = Flask(__name__)
+    app.config.from_object(config[configName or os.getenv('FLASK_ENV', 'default')])
+    if not app.debug and app.config['SECRET_KEY'] == DEFAULT_SECRET_KEY:
+        raise RuntimeError('Set SECRET_KEY before running outside development')
+
+    mysql.init_app(app)
+    csrf.init_app(app)
+    app.register_blueprint(bp)
+    app.extensions['nfl'] = AppState(app.config)
+    if app.config['SCORING_WORKER_ENABLED']:
+        startScoringWorker(app)
+    return app
+
+
+def warmUp(app):
+    # fills the scoreboard cache and opens the pool's idle connections before the first request
+    with app.app_context():
+        try:
+            state().scoreboardCache.get()
+        except Exception as e:
+            logger.warning(f"Could not warm the scoreboard cache: {str(e)}")
+        try:
+            mysql.pool
+        except Exception as e:
+            logger.warning(f"Could not warm the connection pool: {str(e)}")
+
+
 if __name__ == '__main__':
     # Production-ready configuration
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     host = '127.0.0.1' if not debug_mode else '0.0.0.0'
     port = int(os.getenv('PORT', 5000))
-    
-    app.run(debug=debug_mode, host=host, port=port)
+
+    create_app().run(debug=debug_mode, host=host, port=port)
@@ -0,0 +1,214 @@
+"""Compact columnar archive of scoreboard snapshots.
+
+A scoreboard payload is ~150 KB of nested JSON, of which the app reads a few
+fields per game. An archive keeps only those fields as fixed-size records, one
+file per season, appended to each time a new snapshot is captured:
+
+    <season>.nflarc = 16 byte header + RECORD rows, one per game per snapshot
+
+Postseason and preseason snapshots go to <season>-post.nflarc and
+<season>-pre.nflarc, since ESPN numbers their weeks from 1 again. The header
+records the file's season type (0 in files from before, read as regular season).
+
+Rows of one snapshot share their captured timestamp. Because every row has the
+same size, SnapshotArchive maps the file with numpy and slices snapshots out of
+it without copying or parsing anything.
+"""
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+
+from scoreboard import POSTSEASON, PRESEASON, REGULAR_SEASON, Game, Scoreboard, parseScoreboard
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'NFLARC'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S6'), ('version', '<u2'), ('season_type', 'u1'), ('reserved', 'V7')])
+RECORD = np.dtype([
+    ('captured', '<f8'),  # when the snapshot was fetched, shared by all of its games
+    ('date', '<i8'),  # kickoff, epoch seconds
+    ('game_id', '<u8'),
+    ('week', '<u2'),
+    ('season', '<u2'),
+    ('score1', '<i2'),
+    ('score2', '<i2'),
+    ('team1', 'S4'),
+    ('team2', 'S4'),
+    ('state', 'u1'),
+    ('completed', '?'),
+])
+CONTENT = RECORD.names[1:]  # every field but captured
+STATES = ('pre', 'in', 'post')
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+FILE_SUFFIXES = {PRESEASON: '-pre', REGULAR_SEASON: '', POSTSEASON: '-post'}
+
+
+class ArchiveWriter:
+    """Appends each new scoreboard to <directory>/<season>.nflarc (or its -pre/-post file).
+
+    capture() skips a board identical to the last snapshot in its file, whichever
+    process or run wrote it, so it can be handed every fetch (e.g. as
+    ScoreboardCache's onFetch).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, season, seasonType=REGULAR_SEASON):
+        return os.path.join(self.directory, f"{season}{FILE_SUFFIXES.get(seasonType, f'-{seasonType}')}.nflarc")
+
+    def capture(self, capturedAt, board):
+        if not board.games or board.season is None:
+            return None
+        rows = toRecords(capturedAt, board)
+        path = self.path(board.season, board.seasonType)
+        last = lastSnapshot(path, len(rows))
+        if len(last):
+            if np.array_equal(rows[list(CONTENT)], last[list(CONTENT)]):
+                return None
+            # snapshots are told apart by their timestamp, keep them strictly increasing
+            rows['captured'] = max(capturedAt, last['captured'][-1] + 1e-6)
+        os.makedirs(self.directory, exist_ok=True)
+        # one append of whole rows, so concurrent readers never see a torn snapshot
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(np.array([(MAGIC, VERSION, board.seasonType, b'')], HEADER).tobytes())
+            f.write(rows.tobytes())
+        return path
+
+
+class SnapshotArchive:
+    """Memory-mapped, read-only view of one archive file"""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, HEADER, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not a scoreboard archive")
+        if header['version'][0] != VERSION:
+            raise ValueError(f"{path} has unsupported archive version {header['version'][0]}")
+        self.seasonType = int(header['season_type'][0]) or REGULAR_SEASON
+        # a writer may be mid-append, only whole rows are mapped
+        count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+        if count:
+            self.records = np.memmap(path, RECORD, mode='r', offset=HEADER.itemsize, shape=(count,))
+        else:
+            self.records = np.zeros(0, RECORD)
+        captured = self.records['captured']
+        self._starts = np.flatnonzero(np.concatenate(([True], captured[1:] != captured[:-1]))) if count else np.zeros(0, int)
+        self._ends = np.append(self._starts[1:], count)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, i):
+        # records of snapshot i, a view into the mapped file
+        return self.records[self._starts[i]:self._ends[i]]
+
+    def scoreboard(self, i):
+        return fromRecords(self[i], self.seasonType)
+
+    def latestPerWeek(self):
+        """{week: index of the last snapshot captured for it}"""
+        weeks = self.records['week'][self._starts]
+        return {int(week): int(i) for i, week in enumerate(weeks)}
+
+
+def lastSnapshot(path, limit):
+    """Rows of the file's last snapshot, or only its last row if it has more than limit"""
+    try:
+        count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+    except FileNotFoundError:
+        return np.zeros(0, RECORD)
+    # read one row past limit to see where the last snapshot starts
+    tail = min(count, limit + 1)
+    if tail <= 0:
+        return np.zeros(0, RECORD)
+    with open(path, 'rb') as f:
+        f.seek(HEADER.itemsize + (count - tail) * RECORD.itemsize)
+        rows = np.frombuffer(f.read(tail * RECORD.itemsize), RECORD)
+    earlier = np.flatnonzero(rows['captured'] != rows['captured'][-1])
+    if len(earlier):
+        return rows[earlier[-1] + 1:]
+    # too long to be the same board, its last row still gives the latest timestamp
+    return rows[-1:] if tail > limit else rows
+
+
+def toRecords(capturedAt, board):
+    rows = np.zeros(len(board), RECORD)
+    rows['captured'] = capturedAt
+    rows['week'] = board.week
+    rows['season'] = board.season
+    rows['score1'] = board.scores1
+    rows['score2'] = board.scores2
+    for row, game in zip(rows, board.games):
+        row['date'] = int(parseDate(game.date).timestamp())
+        row['game_id'] = int(game.id)
+        row['team1'] = game.team1.encode()
+        row['team2'] = game.team2.encode()
+        row['state'] = STATES.index(game.state)
+        row['completed'] = game.completed
+    return rows
+
+
+def fromRecords(rows, seasonType=REGULAR_SEASON):
+    # column at a time, one tolist() per field instead of a numpy scalar per cell
+    kickoffs = [datetime.datetime.fromtimestamp(date, datetime.timezone.utc).strftime(DATE_FORMAT)
+                for date in rows['date'].tolist()]
+    games = [Game(str(gameID), team1.decode(), team2.decode(), score1, score2, STATES[state], completed, date)
+             for gameID, team1, team2, score1, score2, state, completed, date in zip(
+                 rows['game_id'].tolist(), rows['team1'].tolist(), rows['team2'].tolist(), rows['score1'].tolist(),
+                 rows['score2'].tolist(), rows['state'].tolist(), rows['completed'].tolist(), kickoffs)]
+    return Scoreboard(games, int(rows['week'][0]), int(rows['season'][0]), seasonType)
+
+
+def parseDate(value):
+    # ESPN sends kickoffs as 2022-11-11T01:15Z or with seconds
+    for dateFormat in (DATE_FORMAT, '%Y-%m-%dT%H:%MZ'):
+        try:
+            return datetime.datetime.strptime(value, dateFormat).replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognized kickoff time {value!r}")
+
+
+def importSnapshots(paths, directory):
+    """Archive JSON scoreboard files, oldest modification time first"""
+    writer = ArchiveWriter(directory)
+    written = set()
+    for path in sorted(paths, key=lambda path: (os.path.getmtime(path), path)):
+        with open(path) as f:
+            board = parseScoreboard(json.load(f))
+        archivePath = writer.capture(os.path.getmtime(path), board)
+        if archivePath:
+            written.add(archivePath)
+    return sorted(written)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scoreboard archive tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    importParser = subparsers.add_parser('import', help='Archive JSON scoreboard snapshots')
+    importParser.add_argument('snapshots', help='directory of scoreboard JSON files, searched recursively')
+    importParser.add_argument('directory', help='archive directory, one <season>.nflarc per season')
+    showParser = subparsers.add_parser('show', help='List the snapshots in an archive file')
+    showParser.add_argument('archive')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        for path in importSnapshots(glob.glob(os.path.join(args.snapshots, '**', '*.json'), recursive=True),
+                                    args.directory):
+            print(path)
+    else:
+        archive = SnapshotArchive(args.archive)
+        for i in range(len(archive)):
+            board = archive.scoreboard(i)
+            captured = datetime.datetime.fromtimestamp(archive[i]['captured'][0], datetime.timezone.utc)
+            print(f"{i}\t{captured.strftime(DATE_FORMAT)}\tweek {board.week}\t{len(board)} games\t"
+                  f"{sum(game.completed for game in board.games)} final")
@@ -0,0 +1,175 @@
+"""Re-score archived weeks offline, without touching the production tables.
+
+Takes a directory of ESPN scoreboard snapshots (the format of
+static/14November9_08_NFL_Scoreboard.json, or .nflarc archives written by
+archive.py) and a predictions dump, scores every
+week across a process pool with the live scoring rules and writes one row per
+(season, season type, week, user):
+
+    python backtest.py snapshots/ predictions.csv --output scores.csv
+
+The dump is CSV or JSON lines with user_id, week, team1, team2, score1 and
+score2 (the brycegayan_predictions columns) and optionally season and
+season_type. Without a season column predictions match snapshots by week alone;
+without season_type they are regular season picks, since ESPN numbers
+postseason weeks from 1 again.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from archive import SnapshotArchive
+from scoreboard import REGULAR_SEASON, parseScoreboard
+from scoring import pivotPredictions, scoreWeek
+
+PREDICTION_COLUMNS = ('user_id', 'week', 'team1', 'team2', 'score1', 'score2')
+OPTIONAL_COLUMNS = ('season', 'season_type')
+COLUMN_TYPES = {'user_id': 'i8', 'week': 'i8', 'season': 'i8', 'season_type': 'i8', 'team1': 'S8', 'team2': 'S8', 'score1': 'i8', 'score2': 'i8'}
+
+
+def findWeeks(directory):
+    """Latest snapshot per (season, season type, week): the one with the most completed games, then the newest.
+
+    Snapshots are JSON scoreboard files or snapshots inside .nflarc archives
+    (see archive.py), returned as a path or an (archive path, index) pair.
+    """
+    weeks = {}
+    for ref in snapshotRefs(directory):
+        board = loadSnapshot(ref)
+        if board.week is None:
+            continue
+        done = sum(game.completed for game in board.games)
+        key = (board.season, board.seasonType, int(board.week))
+        if key not in weeks or done >= weeks[key][0]:
+            weeks[key] = (done, ref)
+    return {key: ref for key, (done, ref) in weeks.items()}
+
+
+def snapshotRefs(directory):
+    for path in sorted(glob.glob(os.path.join(directory, '**', '*.json'), recursive=True)):
+        yield path
+    for path in sorted(glob.glob(os.path.join(directory, '**', '*.nflarc'), recursive=True)):
+        for i in range(len(SnapshotArchive(path))):
+            yield (path, i)
+
+
+def loadSnapshot(ref):
+    if isinstance(ref, tuple):
+        path, i = ref
+        return SnapshotArchive(path).scoreboard(i)
+    with open(ref) as f:
+        return parseScoreboard(json.load(f))
+
+
+def loadPredictions(path):
+    """Prediction columns grouped by (season or None, season type, week).
+
+    Each group is (users, matchups, scores1, scores2) as numpy arrays, where
+    matchups index into the returned list of (team1, team2) pairs.
+    """
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            records = [json.loads(line) for line in f if line.strip()]
+            columns = [column for column in PREDICTION_COLUMNS + OPTIONAL_COLUMNS if records and column in records[0]]
+            dump = np.array([tuple(record.get(column) for column in columns) for record in records],
+                            [(column, COLUMN_TYPES[column]) for column in columns])
+        else:
+            header = next(csv.reader(f))
+            columns = [column for column in header if column in COLUMN_TYPES]
+            # numpy's C parser reads millions of rows a second, the csv module is far slower
+            dump = np.loadtxt(f, delimiter=',', ndmin=1, usecols=[header.index(column) for column in columns],
+                              dtype=[(column, COLUMN_TYPES[column]) for column in columns])
+    missing = [column for column in PREDICTION_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Predictions dump has no {', '.join(missing)} column")
+
+    # team codes are compared as 8 byte integers, sorting strings is several times slower
+    teams1, codes1 = np.unique(np.ascontiguousarray(dump['team1']).view(np.uint64), return_inverse=True)
+    teams2, codes2 = np.unique(np.ascontiguousarray(dump['team2']).view(np.uint64), return_inverse=True)
+    matchups = [(team1.decode(), team2.decode()) for team1 in teams1.view('S8') for team2 in teams2.view('S8')]
+    codes = codes1 * len(teams2) + codes2
+    seasons = dump['season'] if 'season' in columns else np.full(len(dump), -1)
+    seasonTypes = dump['season_type'] if 'season_type' in columns else np.full(len(dump), REGULAR_SEASON)
+
+    grouped = {}
+    weekKeys, groups = np.unique(np.stack([seasons, seasonTypes, dump['week']], axis=1), axis=0, return_inverse=True)
+    groups = groups.reshape(-1)  # numpy 2 keeps the inverse 2-D for axis=0
+    for i, (season, seasonType, week) in enumerate(weekKeys.tolist()):
+        rows = groups == i
+        grouped[(season if season >= 0 else None, seasonType, week)] = (
+            dump['user_id'][rows], codes[rows], dump['score1'][rows], dump['score2'][rows])
+    return grouped, matchups
+
+
+def scoreSnapshot(ref, predictions, matchups):
+    """Score one week's predictions against a snapshot, only counting completed games.
+
+    Runs in a worker process, so it reads the snapshot itself and returns plain lists.
+    """
+    board = loadSnapshot(ref)
+    users, codes, scores1, scores2 = predictions
+    columns = np.array([board.gameIndex.get(matchup, -1) for matchup in matchups], np.int64)
+    userIds, picks1, picks2, submitted = pivotPredictions(users, columns[codes], scores1, scores2, len(board))
+    completed = np.array([game.completed for game in board.games], bool)
+    totals = scoreWeek(picks1, picks2, submitted & completed, board.scores1, board.scores2)
+    return userIds.tolist(), totals.tolist(), len(board) - int(completed.sum())
+
+
+def backtest(weeks, predictions, matchups, workers=None):
+    """Yields (season, season type, week, userIds, totals, unfinished games) for every week that has predictions"""
+    jobs = []
+    for (season, seasonType, week), ref in sorted(weeks.items()):
+        groups = [predictions[key] for key in ((season, seasonType, week), (None, seasonType, week)) if key in predictions]
+        if groups:
+            jobs.append(((season, seasonType, week), ref, tuple(np.concatenate(column) for column in zip(*groups))))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(scoreSnapshot, ref, rows, matchups) for key, ref, rows in jobs]
+        for (key, ref, rows), future in zip(jobs, futures):
+            userIds, totals, unfinished = future.result()
+            yield (*key, userIds, totals, unfinished)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score archived weeks with the current scoring rules')
+    parser.add_argument('snapshots', help='directory of scoreboard JSON files and/or archives, searched recursively')
+    parser.add_argument('predictions', help='predictions dump, CSV or JSON lines')
+    parser.add_argument('--output', help='write the CSV here instead of stdout')
+    parser.add_argument('--workers', type=int, help='scoring processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    weeks = findWeeks(args.snapshots)
+    predictions, matchups = loadPredictions(args.predictions)
+    unmatched = sorted((key for key in predictions if not any(
+        key[1:] == (seasonType, week) and key[0] in (None, season) for season, seasonType, week in weeks)),
+        key=lambda key: (key[0] or 0, key[1:]))
+    for season, seasonType, week in unmatched:
+        print(f"no snapshot for season {season} season type {seasonType} week {week}, skipped", file=sys.stderr)
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(['season', 'season_type', 'week', 'user_id', 'score'])
+        scored = 0
+        for season, seasonType, week, userIds, totals, unfinished in backtest(weeks, predictions, matchups, args.workers):
+            if unfinished:
+                print(f"season {season} season type {seasonType} week {week}: {unfinished} games not final, "
+                      f"scored completed games only", file=sys.stderr)
+            writer.writerows((season, seasonType, week, userID, f'{total:g}') for userID, total in zip(userIds, totals))
+            scored += len(userIds)
+    finally:
+        if args.output:
+            output.close()
+    print(f"scored {scored} user weeks from {len(weeks)} snapshots in {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Check that the app's hot queries are served by indexes, not full table scans.
+
+Builds a synthetic database at scale on the SQLite stand-in, drives the routes
+and a scoring run through the test client while recording every statement the
+app issues, then runs EXPLAIN QUERY PLAN on each SELECT, UPDATE and DELETE:
+
+    python -m bench.explain --users 20000
+
+Exits with status 1 if any statement scans a whole table (a SCAN step,
+including a scan of a covering index) other than the tables in SMALL_TABLES.
+Statements that deliberately touch every row (WHERE 1) are skipped.
+SQLite's planner stands in for MySQL's, so this catches a missing or unusable
+index, not every MySQL plan choice.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+
+from bench import sqlite_adapter
+from bench.routes import FIXTURE, ROOT, appModule, flaskApp, login, slateQuery, useScoreboard
+from bench.synthetic import populate
+from scoreboard import parseScoreboard, writeReplaySnapshots
+
+# one row, or the per-run temporary tables the scoring delta is computed in
+SMALL_TABLES = {'brycegayan_info', 'brycegayan_week_scores', 'brycegayan_week_deltas'}
+
+# statement -> the full scans in its plan, explained the first time the app runs it
+plans = {}
+
+
+class ExplainingCursor(sqlite_adapter.DictCursor):
+    # plans are taken on the app's own connection, where the scoring temp tables exist and hold rows
+    def execute(self, query, args=None):
+        self.explain(query, tuple(args or ()))
+        return super().execute(query, args)
+
+    def executemany(self, query, args):
+        args = list(args)
+        if args:
+            self.explain(query, tuple(args[0]))
+        return super().executemany(query, args)
+
+    def explain(self, query, args):
+        if query in plans or not re.match(r'\s*(SELECT|UPDATE|DELETE)\b', query, flags=re.I):
+            return
+        if re.search(r'\bWHERE 1\s*$', query):
+            return  # touches every row on purpose
+        self.connection._db.execute('ANALYZE temp')
+        plans[query] = fullScans(self.connection._db, query, args)
+
+
+class ExplainingConnection(sqlite_adapter.Connection):
+    def cursor(self):
+        return ExplainingCursor(self)
+
+
+def driveApp(dbPath, users, preFixture):
+    """Issue each hot route once or twice and a full scoring run, explaining their statements"""
+    appModule.mysql.close()
+    appModule.mysql.connect = lambda: ExplainingConnection(dbPath)
+    flaskApp.extensions['nfl'] = appModule.AppState(flaskApp.config)
+    client = flaskApp.test_client()
+    board = parseScoreboard(json.load(open(preFixture)))
+    calls = [
+        (preFixture, 1, '/predict'),
+        (preFixture, 2, slateQuery(board, random.Random(0), 'save=Save')),
+        (preFixture, users, slateQuery(board, random.Random(1), 'submit=Submit+Predictions')),
+        (FIXTURE, 10, '/'),
+        (FIXTURE, 10, '/league?id=1'),
+        (FIXTURE, 10, '/league?id=1&page=3'),
+        (FIXTURE, 10, '/api/ranks'),
+        (FIXTURE, 10, '/api/leagues/1/standings'),
+        (FIXTURE, 10, '/api/leagues/1/picks?page=2'),
+        (FIXTURE, 3, f"/join-league?leagueCode=BENCH{2 + users // 200}"),
+    ]
+    for fixture, userID, url in calls:
+        useScoreboard(fixture)
+        login(client, userID)
+        client.get(url).close()
+    with flaskApp.app_context():
+        appModule.scorePredictions()
+    appModule.mysql.close()
+
+
+def fullScans(db, query, args):
+    """The steps of a statement's EXPLAIN QUERY PLAN that scan a whole table"""
+    # MySQL plans a multi-table UPDATE as the join it contains, SQLite's UPDATE ... FROM always
+    # scans its target first, so the join is explained as a SELECT instead
+    match = re.match(r'\s*UPDATE\s+(\w+\s+\w+)\s+(JOIN\s+.+?)\s+SET\s+.+?(\s+WHERE\s+.+)?\s*$', query, flags=re.I | re.S)
+    if match:
+        query = f"SELECT 1 FROM {match.group(1)} {match.group(2)}{match.group(3) or ''}"
+    sql = sqlite_adapter.translate(query)
+    aliases = {alias: table for table, alias in re.findall(
+        r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!WHERE|SET|ON|JOIN|LEFT|ORDER|GROUP)(\w+))?', sql, flags=re.I) if alias}
+    tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    scans = []
+    for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", args).fetchall():
+        match = re.match(r'SCAN (\w+)', row[-1])
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in tables and table not in SMALL_TABLES:
+                scans.append(row[-1])
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a hot query does a full table scan")
+    parser.add_argument('--users', type=int, default=20000, help='synthetic population size')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    args = parser.parse_args()
+
+    flaskApp.logger.setLevel('WARNING')
+    with tempfile.TemporaryDirectory() as workdir:
+        preFixture = writeReplaySnapshots(json.load(open(FIXTURE)), os.path.join(workdir, 'replay'))[0]
+        dbPath = os.path.join(workdir, 'explain.db')
+        connection = sqlite_adapter.connect(dbPath)
+        sqlite_adapter.loadSchema(connection, os.path.join(ROOT, 'create_tables.sql'))
+        # earlier weeks too, so sealing the week archives them
+        populate(connection, parseScoreboard(json.load(open(FIXTURE))), args.users, pastWeeks=2)
+        connection._db.execute('ANALYZE')  # plan with table sizes, as MySQL's statistics would
+        connection.commit()
+        connection.close()
+        driveApp(dbPath, args.users, preFixture)
+
+    failures = 0
+    for query, scans in plans.items():
+        if scans or args.verbose:
+            print(f"{'FULL SCAN' if scans else 'ok'}: {re.sub(r'(%s,)+%s', '%s,...', ' '.join(query.split()))}")
+            for detail in scans:
+                print(f"    {detail}")
+        failures += bool(scans)
+    print(f"{len(plans)} statements checked at {args.users} users, {failures} with full table scans", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,405 @@
+"""Kickoff-deadline load generator: a storm of logins, saves and submits against a running instance.
+
+The hour before the first kickoff is the worst traffic of the week. Each virtual
+user logs in, opens the prediction form, saves their slate a few times while
+changing picks, submits it (some twice at once, like an impatient double click)
+and then views the home and league pages. Arrivals bunch up towards the deadline.
+Afterwards every accepted submission is checked in the database to have been
+stored exactly once, with the scores that were submitted:
+
+    # terminal 1: the app on the SQLite stand-in, scoreboard held before kickoff
+    python -m bench.loadgen serve --db /tmp/load.db --population 10000
+    # terminal 2
+    python -m bench.loadgen run --url http://127.0.0.1:5000 --db sqlite:/tmp/load.db --users 500 --ramp 60
+
+`run` works against any instance whose database it can reach: `--db mysql` uses
+the MYSQL_* settings, like the app. It creates its own accounts (sharing one
+password) and league memberships first, then reports throughput, latency and
+error rate per route, submission outcomes, lock contention (InnoDB row lock
+waits on MySQL, connection pool waits from /metrics when METRICS_ENABLED) and
+the verification result as JSON. The exit status is 1 if verification fails.
+`serve --kickoff-after SECONDS` flips the scoreboard to kicked off mid-storm,
+late saves and submits are then counted as closed rather than as errors.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, 'static', '14November9_08_NFL_Scoreboard.json')
+
+PASSWORD = 'loadgen-password'
+# flashed messages that are an expected answer under a deadline, not an error
+OUTCOMES = {
+    'Predictions submitted successfully!': 'submitted',
+    'You have already submitted predictions for this week': 'duplicate',
+    'You may no longer make predictions for this week': 'closed',
+}
+FLASH_PATTERN = re.compile(r'<div class="alert alert-(danger|success)[^>]*>\s*(.*?)\s*<button', re.S)
+CSRF_PATTERN = re.compile(r'name="csrf_token" value="([^"]+)"')
+TEAM_PATTERN = re.compile(r'class="prediction" type="number" id="(\w+)"')
+DB_TIMING_PATTERN = re.compile(r'\bdb;dur=([\d.]+)')
+LOCK_COUNTERS = ('Innodb_row_lock_waits', 'Innodb_row_lock_time', 'Table_locks_waited')
+POOL_METRICS = ('nfl_db_pool_acquire_seconds_total', 'nfl_db_pool_acquire_timeouts', 'nfl_db_pool_acquires')
+
+
+class Recorder:
+    """Thread-safe latency, server DB time and failure samples per route"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+
+    def request(self, session, route, method, url, **kwargs):
+        # a redirect chain counts as one request, timed like a browser would see it
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = (time.perf_counter() - start) * 1000
+        dbMs, ok = 0.0, False
+        if response is not None:
+            for hop in (*response.history, response):
+                dbMs += sum(float(value) for value in DB_TIMING_PATTERN.findall(hop.headers.get('Server-Timing', '')))
+            unexpected = [text for kind, text in flashes(response.text) if kind == 'danger' and text not in OUTCOMES]
+            ok = response.status_code < 400 and not unexpected
+        with self._lock:
+            self._samples[route].append((elapsed, dbMs, ok))
+        return response
+
+    def summary(self):
+        routes = {}
+        for route, samples in sorted(self._samples.items()):
+            latencies = sorted(sample[0] for sample in samples)
+            routes[route] = {
+                'requests': len(samples),
+                'errors': sum(not sample[2] for sample in samples),
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p90_ms': round(percentile(latencies, 0.90), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'max_ms': round(latencies[-1], 2),
+                'mean_db_ms': round(sum(sample[1] for sample in samples) / len(samples), 2),
+            }
+        return routes
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def flashes(html):
+    return [(kind, text) for kind, text in FLASH_PATTERN.findall(html or '')]
+
+
+def outcomeOf(response):
+    if response is None:
+        return 'failed'
+    for kind, text in flashes(response.text):
+        if text in OUTCOMES:
+            return OUTCOMES[text]
+    return 'failed'
+
+
+def virtualUser(base, username, leagueID, rng, recorder, args):
+    """One user's session before the deadline, returns how their submission went"""
+    result = {'username': username, 'accepted': 0, 'outcome': 'failed', 'slate': None, 'answers': []}
+    session = requests.Session()
+    think = lambda: time.sleep(rng.expovariate(1 / args.think) if args.think > 0 else 0)  # noqa: E731
+
+    page = recorder.request(session, 'login_form', 'GET', f"{base}/log-in")
+    token = CSRF_PATTERN.search(page.text) if page is not None else None
+    if token is None:
+        return result
+    page = recorder.request(session, 'login', 'POST', f"{base}/log-in-verification",
+                            data={'csrf_token': token.group(1), 'username': username, 'password': PASSWORD})
+    if page is None or not any(text == 'Login successful!' for kind, text in flashes(page.text)):
+        return result
+    think()
+
+    page = recorder.request(session, 'predict', 'GET', f"{base}/predict")
+    teams = TEAM_PATTERN.findall(page.text) if page is not None else []
+    if not teams:
+        result['outcome'] = 'closed' if outcomeOf(page) == 'closed' else 'failed'
+        return result
+    slate = {team: rng.randrange(0, 45) for team in teams}
+    for i in range(rng.randint(args.min_saves, args.max_saves)):
+        # users change their minds on a few games between saves
+        for team in rng.sample(teams, max(1, len(teams) // 4)):
+            slate[team] = rng.randrange(0, 45)
+        page = recorder.request(session, 'save', 'GET', f"{base}/enter-predictions?{urlencode(slate)}&save=Save")
+        if outcomeOf(page) == 'closed':
+            result['outcome'] = 'closed'
+            return result
+        think()
+
+    url = f"{base}/enter-predictions?{urlencode(slate)}&submit=Submit+Predictions"
+    if rng.random() < args.double_submit:
+        # both clicks carry the same session cookie and race to the server
+        twin = requests.Session()
+        twin.cookies.update(session.cookies)
+        responses = [None, None]
+        threads = [threading.Thread(target=lambda i, s: responses.__setitem__(i, recorder.request(s, 'submit', 'GET', url)),
+                                    args=(i, s)) for i, s in enumerate((session, twin))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        responses = [recorder.request(session, 'submit', 'GET', url)]
+    outcomes = [outcomeOf(response) for response in responses]
+    result['answers'] = outcomes
+    result['accepted'] = outcomes.count('submitted')
+    result['outcome'] = next((outcome for outcome in ('submitted', 'closed', 'duplicate') if outcome in outcomes), 'failed')
+    result['slate'] = slate
+
+    for i in range(args.views):
+        think()
+        recorder.request(session, 'index', 'GET', f"{base}/")
+        recorder.request(session, 'league', 'GET', f"{base}/league?id={leagueID}")
+    return result
+
+
+def storm(base, users, recorder, args):
+    """Run every virtual user, arriving over args.ramp seconds with the rate rising towards the deadline"""
+    rng = random.Random(args.seed)
+    # arrival density grows linearly up to the deadline at the end of the ramp
+    offsets = sorted(args.ramp * math.sqrt(rng.random()) for user in users)
+    started = time.perf_counter()
+
+    def arrive(offset, username, leagueID, seed):
+        time.sleep(max(0.0, started + offset - time.perf_counter()))
+        return virtualUser(base, username, leagueID, random.Random(seed), recorder, args)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(arrive, offset, username, leagueID, rng.random())
+                   for offset, (username, (userID, leagueID)) in zip(offsets, users.items())]
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - started
+
+
+def openDatabase(spec):
+    """'sqlite:<path>' for the bench stand-in, 'mysql' for the MYSQL_* settings"""
+    if spec.startswith('sqlite:'):
+        from bench import sqlite_adapter
+        return sqlite_adapter.connect(spec.partition(':')[2])
+    import MySQLdb
+    import MySQLdb.cursors
+    from config import Config
+    return MySQLdb.connect(host=Config.MYSQL_HOST, user=Config.MYSQL_USER, passwd=Config.MYSQL_PASSWORD,
+                           db=Config.MYSQL_DB, cursorclass=MySQLdb.cursors.DictCursor)
+
+
+def prepareUsers(connection, prefix, count, rng):
+    """Create count accounts, each in one existing league, returns {username: (user id, league id)}"""
+    from werkzeug.security import generate_password_hash
+    cursor = connection.cursor()
+    # one hash for every account, logging in still checks it like any other
+    hashed = generate_password_hash(PASSWORD)
+    cursor.executemany('INSERT INTO brycegayan_users(username, password) VALUES (%s, %s)',
+                       [(f"{prefix}{i}", hashed) for i in range(count)])
+    cursor.execute('SELECT id, username FROM brycegayan_users WHERE username LIKE %s', (f"{prefix}%",))
+    userIDs = {row['username']: row['id'] for row in cursor.fetchall()}
+    cursor.execute('SELECT id FROM brycegayan_leagues ORDER BY id LIMIT 1000')
+    leagueIDs = [row['id'] for row in cursor.fetchall()]
+    if not leagueIDs:
+        cursor.executemany('INSERT INTO brycegayan_leagues(name, join_code) VALUES (%s, %s)',
+                           [(f"Load League {i}", f"{prefix.upper()}{i}") for i in range(max(1, count // 50))])
+        cursor.execute('SELECT id FROM brycegayan_leagues WHERE join_code LIKE %s', (f"{prefix.upper()}%",))
+        leagueIDs = [row['id'] for row in cursor.fetchall()]
+    users = {username: (userID, rng.choice(leagueIDs)) for username, userID in sorted(userIDs.items())}
+    cursor.executemany('INSERT INTO brycegayan_users_leagues(user_id, league_id) VALUES (%s, %s)', list(users.values()))
+    connection.commit()
+    return users
+
+
+def verifySubmissions(connection, users, results):
+    """Check every accepted slate is stored once with its scores, and nothing else was stored"""
+    cursor = connection.cursor()
+    stored = defaultdict(list)
+    userIDs = [userID for userID, leagueID in users.values()]
+    for start in range(0, len(userIDs), 1000):
+        chunk = userIDs[start:start + 1000]
+        cursor.execute(f"""SELECT user_id, week, team1, team2, score1, score2 FROM brycegayan_predictions
+            WHERE user_id IN ({','.join(['%s'] * len(chunk))})""", chunk)
+        for row in cursor.fetchall():
+            stored[row['user_id']].append(row)
+
+    problems = Counter()
+    examples = []
+    for result in results:
+        rows = stored.get(users[result['username']][0], [])
+        if result['accepted'] > 1:
+            problem = 'accepted_twice'
+        elif result['accepted'] == 0:
+            problem = 'stored_unacknowledged' if rows else None  # e.g. the response was lost after the commit
+        elif len({(row['week'], row['team1']) for row in rows}) != len(rows):
+            problem = 'duplicated'
+        elif len(rows) != len(result['slate']) // 2:
+            problem = 'missing'
+        elif any((row['score1'], row['score2']) != (result['slate'][row['team1']], result['slate'][row['team2']]) for row in rows):
+            problem = 'mismatched'
+        else:
+            problem = None
+        if problem:
+            problems[problem] += 1
+            if len(examples) < 10:
+                examples.append({'username': result['username'], 'problem': problem, 'rows': len(rows)})
+    accepted = sum(result['accepted'] > 0 for result in results)
+    failed = sum(problems[problem] for problem in ('accepted_twice', 'duplicated', 'missing', 'mismatched'))
+    return {'accepted_slates': accepted, 'verified': accepted - failed, 'problems': dict(problems),
+            'examples': examples, 'passed': failed == 0}
+
+
+def lockCounters(connection):
+    # InnoDB lock waits on MySQL, SQLite has no equivalent counters
+    if type(connection).__module__.startswith('bench.'):
+        return None
+    cursor = connection.cursor()
+    cursor.execute(f"SHOW GLOBAL STATUS WHERE Variable_name IN ({','.join(['%s'] * len(LOCK_COUNTERS))})", LOCK_COUNTERS)
+    return {row['Variable_name']: int(row['Value']) for row in cursor.fetchall()}
+
+
+def poolMetrics(base):
+    # /metrics is served by one worker, so under several workers this samples only that one
+    try:
+        response = requests.get(f"{base}/metrics", timeout=10)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    values = {}
+    for line in response.text.splitlines():
+        name, _, value = line.partition(' ')
+        if name in POOL_METRICS:
+            values[name] = float(value)
+    return values
+
+
+def difference(before, after):
+    if before is None or after is None:
+        return None
+    return {name: round(after[name] - before.get(name, 0), 3) for name in after}
+
+
+def runCommand(args):
+    base = args.url.rstrip('/')
+    rng = random.Random(args.seed)
+    connection = openDatabase(args.db)
+    prefix = f"load{int(time.time()) % 10**8}u"
+    users = prepareUsers(connection, prefix, args.users, rng)
+    print(f"created {len(users)} accounts ({prefix}*), storming {base}...", file=sys.stderr)
+
+    locksBefore, poolBefore = lockCounters(connection), poolMetrics(base)
+    recorder = Recorder(args.timeout)
+    results, seconds = storm(base, users, recorder, args)
+    locksAfter, poolAfter = lockCounters(connection), poolMetrics(base)
+    connection.commit()  # a fresh snapshot for the checks below
+    verification = verifySubmissions(connection, users, results)
+    connection.close()
+
+    routes = recorder.summary()
+    requestCount = sum(route['requests'] for route in routes.values())
+    errors = sum(route['errors'] for route in routes.values())
+    report = {
+        'meta': {'url': base, 'users': len(users), 'concurrency': args.concurrency, 'ramp_seconds': args.ramp,
+                 'double_submit': args.double_submit, 'seed': args.seed,
+                 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())},
+        'seconds': round(seconds, 2),
+        'requests': requestCount,
+        'throughput_rps': round(requestCount / seconds, 1),
+        'error_rate': round(errors / requestCount, 4) if requestCount else 0,
+        'outcomes': dict(Counter(result['outcome'] for result in results)),
+        # every submit response, a double click should get one success and one duplicate
+        'submit_answers': dict(Counter(answer for result in results for answer in result['answers'])),
+        'routes': routes,
+        'contention': {'db_locks': difference(locksBefore, locksAfter), 'pool': difference(poolBefore, poolAfter)},
+        'verification': verification,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    sys.exit(0 if verification['passed'] else 1)
+
+
+def serveCommand(args):
+    """Serve the app on the SQLite stand-in with the fixture week before kickoff"""
+    from scoreboard import parseScoreboard, writeReplaySnapshots
+    replay = writeReplaySnapshots(json.load(open(FIXTURE)), os.path.join(tempfile.mkdtemp(), 'replay'))
+    # the first replay snapshot is the whole week before kickoff, the next one kicks off the first games
+    os.environ.setdefault('SECRET_KEY', 'loadgen')
+    os.environ['SCOREBOARD_SOURCE'] = f"replay:{os.path.dirname(replay[0])}"
+    os.environ['SCOREBOARD_REPLAY_INTERVAL'] = str(int(args.kickoff_after or 10**9))
+    os.environ['SCOREBOARD_CACHE_TTL'] = '1'
+    os.environ['SCORING_WORKER_ENABLED'] = 'False'
+    os.environ['DB_TIMING_HEADERS'] = 'True'
+    os.environ['METRICS_ENABLED'] = 'True'
+
+    import app as appModule
+    from bench import sqlite_adapter
+    from bench.synthetic import populate
+    if not os.path.exists(args.db):
+        connection = sqlite_adapter.connect(args.db)
+        sqlite_adapter.loadSchema(connection, os.path.join(ROOT, 'create_tables.sql'))
+        # everyone already registered, before kickoff nobody has submitted yet
+        summary = populate(connection, parseScoreboard(json.load(open(replay[0]))), args.population, submitRate=0)
+        connection.close()
+        print(f"populated {args.db}: {summary}", file=sys.stderr)
+
+    flaskApp = appModule.create_app('development')
+    appModule.mysql.connect = lambda: sqlite_adapter.connect(args.db)
+    flaskApp.logger.setLevel('WARNING')
+    flaskApp.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kickoff-deadline load generator')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='Storm a running instance and verify the submissions')
+    run.add_argument('--url', default='http://127.0.0.1:5000')
+    run.add_argument('--db', default='mysql', help="the instance's database: 'mysql' or 'sqlite:<path>'")
+    run.add_argument('--users', type=int, default=200, help='virtual users')
+    run.add_argument('--concurrency', type=int, default=50, help='users active at once')
+    run.add_argument('--ramp', type=float, default=60, help='seconds over which users arrive, ending at the deadline')
+    run.add_argument('--think', type=float, default=0.5, help='mean seconds between a user\'s steps')
+    run.add_argument('--min-saves', type=int, default=1)
+    run.add_argument('--max-saves', type=int, default=4)
+    run.add_argument('--double-submit', type=float, default=0.1, help='fraction of users who submit twice at once')
+    run.add_argument('--views', type=int, default=2, help='home and league page views after submitting')
+    run.add_argument('--timeout', type=float, default=30, help='seconds per request')
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', help='write JSON here instead of stdout')
+
+    serve = subparsers.add_parser('serve', help='Serve the app on the SQLite stand-in, before kickoff')
+    serve.add_argument('--db', required=True, help='SQLite database, created and populated if missing')
+    serve.add_argument('--population', type=int, default=10000, help='synthetic users in a new database')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=5000)
+    serve.add_argument('--kickoff-after', type=int, default=None, help='seconds until the first games kick off')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        runCommand(args)
+    else:
+        serveCommand(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Offline end-to-end benchmark of the Flask routes and a scoring run.
+
+Runs the app against the SQLite adapter and the bundled week 10 scoreboard, so no
+MySQL server or network is needed. For each population size it builds a fresh
+synthetic database and reports latency percentiles, queries per request and
+memory as JSON:
+
+    python -m bench.routes --users 1000 10000 100000 --requests 200 --output bench.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, 'static', '14November9_08_NFL_Scoreboard.json')
+
+# configure the app before it is imported
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('SCOREBOARD_SOURCE', f'file:{FIXTURE}')
+os.environ['DB_TIMING_HEADERS'] = 'True'
+os.environ['SCORING_WORKER_ENABLED'] = 'False'
+
+import app as appModule  # noqa: E402
+from bench import sqlite_adapter  # noqa: E402
+from bench.synthetic import populate  # noqa: E402
+from scoreboard import FileSource, ScoreboardCache, parseScoreboard, writeReplaySnapshots  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+flaskApp = appModule.create_app()
+
+
+def useScoreboard(path):
+    flaskApp.extensions['nfl'].scoreboardCache = ScoreboardCache(FileSource(path).fetch, ttl=3600)
+
+
+def useDatabase(path):
+    appModule.mysql.close()
+    appModule.mysql.connect = lambda: sqlite_adapter.connect(path)
+
+
+def login(client, userID):
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess['brycegayan_username'] = f"user{userID}"
+        sess['brycegayan_user_id'] = userID
+
+
+def flashedErrors(client):
+    with client.session_transaction() as sess:
+        flashes = sess.pop('_flashes', [])
+    return sum(1 for category, message in flashes if category == 'error')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timeRoute(client, calls, traceMemory=False):
+    """Issue (userID, url) calls and summarize latency, queries and failures"""
+    latencies, queries, statuses = [], [], Counter()
+    errors = 0
+    if traceMemory:
+        tracemalloc.start()
+    for userID, url in calls:
+        login(client, userID)
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()  # drain streamed pages so rendering is timed too
+        response.close()
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+        queries.append(int(response.headers.get('X-DB-Queries', 0)))
+        errors += flashedErrors(client)
+    result = {
+        'requests': len(calls),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p90_ms': round(percentile(latencies, 0.90), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(max(latencies), 3),
+        'mean_queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'errors': errors,
+        'statuses': dict(statuses),
+    }
+    if traceMemory:
+        result['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def slateQuery(board, rng, action):
+    params = '&'.join(f"{team}={rng.randrange(0, 45)}" for matchup in board.matchups for team in matchup)
+    return f"/enter-predictions?{params}&{action}"
+
+
+def benchPopulation(users, requests, workdir, preFixture, seed=0, traceMemory=False):
+    rng = random.Random(seed)
+    preBoard = parseScoreboard(json.load(open(preFixture)))
+    finalBoard = parseScoreboard(json.load(open(FIXTURE)))
+
+    dbPath = os.path.join(workdir, f"bench-{users}.db")
+    connection = sqlite_adapter.connect(dbPath)
+    sqlite_adapter.loadSchema(connection, os.path.join(ROOT, 'create_tables.sql'))
+    start = time.perf_counter()
+    summary = populate(connection, finalBoard, users, seed=seed)
+    summary['populate_seconds'] = round(time.perf_counter() - start, 2)
+    cursor = connection.cursor()
+    cursor.execute('SELECT user_id, league_id FROM brycegayan_users_leagues')
+    memberships = [(row['user_id'], row['league_id']) for row in cursor.fetchall()]
+    cursor.execute('SELECT u.id FROM brycegayan_users u WHERE NOT EXISTS '
+                   '(SELECT 1 FROM brycegayan_predictions p WHERE p.user_id = u.id)')
+    unsubmitted = [row['id'] for row in cursor.fetchall()]
+    connection.close()
+
+    useDatabase(dbPath)
+    flaskApp.extensions['nfl'] = appModule.AppState(flaskApp.config)  # caches start empty for each population
+    client = flaskApp.test_client()
+    randomUsers = [rng.randint(1, users) for i in range(requests)]
+    routes = {}
+
+    # before kickoff: the prediction form and saving/submitting slates
+    useScoreboard(preFixture)
+    routes['makePredictions'] = timeRoute(client, [(u, '/predict') for u in randomUsers], traceMemory)
+    routes['enterPredictions_save'] = timeRoute(
+        client, [(u, slateQuery(preBoard, rng, 'save=Save')) for u in randomUsers], traceMemory)
+    submitters = rng.sample(unsubmitted, min(requests, len(unsubmitted)))
+    if submitters:
+        routes['enterPredictions_submit'] = timeRoute(
+            client, [(u, slateQuery(preBoard, rng, 'submit=Submit+Predictions')) for u in submitters], traceMemory)
+
+    # after kickoff: home page and league grids
+    useScoreboard(FIXTURE)
+    routes['index'] = timeRoute(client, [(u, '/') for u in randomUsers], traceMemory)
+    sampled = [rng.choice(memberships) for i in range(requests)]
+    routes['league'] = timeRoute(client, [(u, f"/league?id={league}") for u, league in sampled], traceMemory)
+    largest = [u for u, league in memberships if league == 1]
+    if largest:
+        routes['league_largest'] = timeRoute(
+            client, [(rng.choice(largest), '/league?id=1') for i in range(min(requests, 20))], traceMemory)
+
+    # one full scoring run over the population
+    if traceMemory:
+        tracemalloc.start()
+    with flaskApp.app_context():
+        start = time.perf_counter()
+        scored = appModule.scorePredictions()
+        scoring = {'scored': scored, 'seconds': round(time.perf_counter() - start, 3),
+                   'queries': appModule.g.get('dbQueries', 0)}
+    if traceMemory:
+        scoring['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+
+    result = {'population': summary, 'routes': routes, 'scoring': scoring}
+    if resource is not None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 2**20 if sys.platform == 'darwin' else 2**10
+        result['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+    return result
+
+
+def gitRevision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the Flask routes and scoring')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000], help='population sizes to run')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route and population')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help='report peak Python allocations per route (slower)')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    flaskApp.logger.setLevel('WARNING')
+    results = {
+        'meta': {
+            'revision': gitRevision(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': f"sqlite {sqlite_adapter.sqlite3.sqlite_version}",
+            'requests_per_route': args.requests,
+            'seed': args.seed,
+        },
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        preFixture = writeReplaySnapshots(json.load(open(FIXTURE)), os.path.join(workdir, 'replay'))[0]
+        for users in args.users:
+            print(f"benchmarking {users} users...", file=sys.stderr)
+            results['runs'].append(benchPopulation(users, args.requests, workdir, preFixture,
+                                                   seed=args.seed, traceMemory=args.trace_memory))
+            appModule.mysql.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""SQLite stand-in for MySQLdb, so the app and benchmarks can run without a MySQL server.
+
+Connections behave like a MySQLdb connection with a DictCursor. The app's MySQL
+dialect (%s placeholders, ON DUPLICATE KEY UPDATE, UPDATE ... JOIN, GET_LOCK)
+is rewritten to SQLite on the fly, and create_tables.sql is translated into an
+equivalent SQLite schema. SQLite 3.35+ is required.
+"""
+import re
+import sqlite3
+
+try:
+    import MySQLdb
+    IntegrityError = MySQLdb.IntegrityError
+except ImportError:
+    IntegrityError = sqlite3.IntegrityError
+
+
+def connect(path):
+    return Connection(path)
+
+
+class Connection:
+    def __init__(self, path):
+        # PARSE_DECLTYPES turns TIMESTAMP columns into datetimes, as MySQLdb does
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._db.execute('PRAGMA foreign_keys = ON')
+
+    def cursor(self):
+        return DictCursor(self)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self):
+        self._db.execute('SELECT 1')
+
+    def close(self):
+        self._db.close()
+
+
+class DictCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, args=None):
+        try:
+            self._cursor.execute(translate(query), tuple(args or ()))
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        args = list(args)
+        if not args:
+            return 0
+        try:
+            self._cursor.executemany(translate(query), [tuple(row) for row in args])
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        return self._cursor.rowcount
+
+    def fetchall(self):
+        names = [column[0] for column in self._cursor.description or ()]
+        return tuple(dict(zip(names, row)) for row in self._cursor.fetchall())
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def close(self):
+        self._cursor.close()
+
+
+_translated = {}
+
+
+def translate(query):
+    """Rewrite one MySQL statement as used by the app into SQLite"""
+    if query in _translated:
+        return _translated[query]
+    sql = query.replace('%s', '?')
+    # locks always succeed, keeping every placeholder so the parameters still line up
+    sql = re.sub(r'\b(?:GET_LOCK|RELEASE_LOCK)\(([^)]*)\)',
+                 lambda m: '(' + ' AND '.join(f"{arg.strip()} IS NOT NULL" for arg in m.group(1).split(',')) + ')', sql, flags=re.I)
+    sql = re.sub(r'\bDROP TEMPORARY TABLE\b', 'DROP TABLE', sql, flags=re.I)
+    sql = re.sub(r'\bINSERT IGNORE\b', 'INSERT OR IGNORE', sql, flags=re.I)
+    sql = re.sub(r'\s+FOR UPDATE\s*$', '', sql, flags=re.I)
+    if re.search(r'\bON DUPLICATE KEY UPDATE\b', sql, flags=re.I):
+        sql = re.sub(r'\bON DUPLICATE KEY UPDATE\b', 'ON CONFLICT DO UPDATE SET', sql, flags=re.I)
+        sql = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql, flags=re.I)
+    match = re.match(r'\s*UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+?)(?:\s+WHERE\s+(.+))?\s*$',
+                     sql, flags=re.I | re.S)
+    if match:
+        table, alias, joined, joinedAlias, on, assignments, where = match.groups()
+        # SQLite only allows unqualified column names on the left of SET
+        assignments = re.sub(rf'(^|,)\s*{alias}\.(\w+)\s*=', r'\1 \2 =', assignments)
+        sql = f"UPDATE {table} AS {alias} SET {assignments.strip()} FROM {joined} AS {joinedAlias} WHERE {on}"
+        if where:
+            sql += f" AND ({where})"
+    match = re.match(r'\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.+?)\s+ORDER\s+BY\s+(.+?)\s+LIMIT\s+(\S+)\s*$', sql, flags=re.I | re.S)
+    if match:
+        table, where, order, limit = match.groups()
+        sql = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} ORDER BY {order} LIMIT {limit})"
+    _translated[query] = sql
+    return sql
+
+
+def loadSchema(connection, path='create_tables.sql'):
+    """Create the tables from create_tables.sql, translated to SQLite"""
+    with open(path) as f:
+        script = re.sub(r'--[^\n]*', '', f.read())
+    for statement in script.split(';'):
+        statement = statement.strip()
+        if not statement or re.match(r'(USE|SHOW|SET|ALTER)\b', statement, flags=re.I):
+            continue
+        if re.match(r'CREATE\s+TABLE', statement, flags=re.I):
+            for sql in translateCreateTable(statement):
+                connection._db.execute(sql)
+        else:
+            connection._db.execute(translate(statement))
+    connection.commit()
+
+
+def translateCreateTable(statement):
+    match = re.match(r'CREATE\s+TABLE\s+(?:IF NOT EXISTS\s+)?(\w+)\s*\((.*)\)[^)]*$', statement, flags=re.I | re.S)
+    table, body = match.groups()
+    columns, indexes = [], []
+    for line in splitDefinitions(body):
+        index = re.match(r'(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.+)\)$', line, flags=re.I)
+        if index:
+            unique, name, cols = index.groups()
+            indexes.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX {table}_{name} ON {table} ({cols})")
+            continue
+        line = re.sub(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', line, flags=re.I)
+        line = re.sub(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', '', line, flags=re.I)
+        columns.append(line)
+    return [f"CREATE TABLE {table} ({', '.join(columns)})"] + indexes
+
+
+def splitDefinitions(body):
+    # split a CREATE TABLE body on top level commas
+    parts, depth, current = [], 0, ''
+    for char in body:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
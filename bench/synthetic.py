@@ -0,0 +1,81 @@
+"""Synthetic users, leagues and predictions for benchmarks and load tests"""
+import random
+
+BATCH_SIZE = 5000
+
+
+def populate(connection, board, users, submitRate=0.9, draftRate=0.5, pastWeeks=0, seed=0):
+    """Fill an empty database with users spread across leagues of varying size.
+
+    League 1 holds every 10th user, so large populations get one very large league.
+    Everyone else lands in a small (~20) or medium (~200) league and some join a
+    second one. submitRate of users submit a full slate for board.week, and
+    draftRate of the rest have saved drafts. Submitters also get slates for the
+    pastWeeks weeks before board.week, as a table that was never archived. Works on any DB-API connection that
+    takes %s placeholders (MySQLdb or the SQLite adapter). Returns a summary dict.
+    """
+    rng = random.Random(seed)
+    cursor = connection.cursor()
+
+    usernames = [f"user{i}" for i in range(1, users + 1)]
+    # every account shares one hash, benchmarks log in through the session instead
+    insertBatches(cursor, 'INSERT INTO brycegayan_users(id, username, password) VALUES (%s, %s, %s)',
+                  ((i, name, 'pbkdf2:sha256:600000$bench$0') for i, name in enumerate(usernames, 1)))
+
+    smallLeagues = max(1, users // 20)
+    mediumLeagues = max(1, users // 200)
+    numLeagues = 1 + mediumLeagues + smallLeagues
+    insertBatches(cursor, 'INSERT INTO brycegayan_leagues(id, name, join_code) VALUES (%s, %s, %s)',
+                  ((i, f"League {i}", f"BENCH{i}") for i in range(1, numLeagues + 1)))
+
+    memberships = set()
+    for userID in range(1, users + 1):
+        if userID % 10 == 0:
+            memberships.add((userID, 1))
+        if rng.random() < 0.5:
+            memberships.add((userID, 2 + rng.randrange(mediumLeagues)))
+        else:
+            memberships.add((userID, 2 + mediumLeagues + rng.randrange(smallLeagues)))
+        if rng.random() < 0.2:
+            memberships.add((userID, 2 + rng.randrange(numLeagues - 1)))
+    # earlier weeks predate the score ledger, so their points are carried as the base score
+    scores = [rng.randrange(0, 1500) for membership in memberships]
+    insertBatches(cursor, 'INSERT INTO brycegayan_users_leagues(user_id, league_id, score, base_score) VALUES (%s, %s, %s, %s)',
+                  ((userID, leagueID, score, score) for (userID, leagueID), score in zip(sorted(memberships), scores)))
+
+    submitted, drafted = [], []
+    for userID in range(1, users + 1):
+        if rng.random() < submitRate:
+            submitted.append(userID)
+        elif rng.random() < draftRate:
+            drafted.append(userID)
+
+    def slates(userIDs, week=board.week, season=()):
+        for userID in userIDs:
+            for team1, team2 in board.matchups:
+                yield (userID, team1, rng.randrange(0, 45), team2, rng.randrange(0, 45), week, *season)
+
+    # submissions carry their season and season type, drafts don't
+    season = (board.season or 0, board.seasonType)
+    query = 'INSERT INTO brycegayan_predictions(user_id, team1, score1, team2, score2, week, season, season_type) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'
+    insertBatches(cursor, query, slates(submitted, season=season))
+    insertBatches(cursor, 'INSERT INTO brycegayan_savedpredictions(user_id, team1, score1, team2, score2, week) VALUES (%s, %s, %s, %s, %s, %s)',
+                  slates(drafted))
+    for week in range(max(1, board.week - pastWeeks), board.week):
+        insertBatches(cursor, query, slates(submitted, week, season))
+    cursor.execute('DELETE FROM brycegayan_info WHERE 1')
+    cursor.execute('INSERT INTO brycegayan_info(recentWeek) VALUES (%s)', (0,))
+    connection.commit()
+    return {'users': users, 'leagues': numLeagues, 'memberships': len(memberships),
+            'submitted': len(submitted), 'drafted': len(drafted), 'largest_league': users // 10}
+
+
+def insertBatches(cursor, query, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(query, batch)
+            batch = []
+    if batch:
+        cursor.executemany(query, batch)
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU map, evicting the least recently used entry past maxEntries"""
+
+    def __init__(self, maxEntries=256):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, match):
+        # drops every entry whose key satisfies match(key)
+        with self._lock:
+            for key in [key for key in self._entries if match(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LocalStore:
+    """Cache backend for one process, the stand-in for a shared store in development and tests.
+
+    Every store maps string keys to picklable values that expire after ttl
+    seconds; get() returns default for missing, expired or unreadable entries.
+    """
+
+    def __init__(self, maxEntries=1024, ttl=3600):
+        self.ttl = ttl
+        self._entries = LRUCache(maxEntries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries.set(key, (time.time() + self.ttl, value))
+
+    def delete(self, key):
+        self._entries.delete(key)
+
+
+def privateDirectory(path):
+    """Create path (mode 0700) if needed and check that only this user can write to it.
+
+    Files in it are trusted (unpickled, served as scores), so a directory another
+    user owns or can write to, e.g. a planted one in /tmp, raises ValueError.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ValueError(f"{path} is not a directory")
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+        raise ValueError(f"{path} must be owned by this user and not writable by group or others")
+    return path
+
+
+class FileStore:
+    """Cache backend shared by every worker process on one host, one pickle file per key"""
+
+    def __init__(self, directory, maxEntries=1024, ttl=3600):
+        self.directory = privateDirectory(directory)
+        self.maxEntries = maxEntries
+        self.ttl = ttl
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.pickle')
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if os.stat(path).st_mtime + self.ttl < time.time():
+                return default
+            with open(path, 'rb') as f:
+                storedKey, value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception as e:
+            logger.warning(f"Unreadable cache entry {path}: {str(e)}")
+            return default
+        return value if storedKey == key else default
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmpPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmpPath, 'wb') as f:
+                pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {path}: {str(e)}")
+            return
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _prune(self):
+        # drops expired entries, then the oldest ones past maxEntries
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        entries.sort(reverse=True)
+        expired = time.time() - self.ttl
+        for i, (mtime, path) in enumerate(entries):
+            if i >= self.maxEntries or mtime < expired:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class RedisStore:
+    """Cache backend shared by every worker on every host; needs the redis package"""
+
+    def __init__(self, url, ttl=3600, prefix='nfl:'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def get(self, key, default=None):
+        # an unreachable Redis is a cache miss, pages still render from MySQL
+        try:
+            value = self._client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis get failed: {str(e)}")
+            return default
+        return default if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        try:
+            self._client.setex(self.prefix + key, int(self.ttl), pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Redis set failed: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self._client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis delete failed: {str(e)}")
+
+
+def makeStore(spec, maxEntries=1024, ttl=3600):
+    """'local', 'file:<directory>' or a redis:// / rediss:// URL"""
+    if spec.startswith('file:'):
+        return FileStore(spec[len('file:'):], maxEntries=maxEntries, ttl=ttl)
+    if spec.startswith('redis://') or spec.startswith('rediss://'):
+        return RedisStore(spec, ttl=ttl)
+    if spec == 'local':
+        return LocalStore(maxEntries=maxEntries, ttl=ttl)
+    raise ValueError(f"Unknown cache backend {spec!r}")
+
+
+def cacheKey(namespace, *parts):
+    return f"{namespace}:" + ':'.join(str(part) for part in parts)
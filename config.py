@@ -3,14 +3,23 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_SECRET_KEY = 'dev-secret-key-change-in-production'
+
 class Config:
     """Base configuration class"""
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    SECRET_KEY = os.getenv('SECRET_KEY', DEFAULT_SECRET_KEY)
     MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
     MYSQL_USER = os.getenv('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
     MYSQL_DB = os.getenv('MYSQL_DB', 'nfl_predictions')
     MYSQL_CURSORCLASS = 'DictCursor'
+
+    # Connection pool settings, per worker process: keep workers * MYSQL_POOL_MAX under MySQL's max_connections
+    MYSQL_POOL_MIN = int(os.getenv('MYSQL_POOL_MIN', 1))  # connections opened when the worker starts
+    MYSQL_POOL_MAX = int(os.getenv('MYSQL_POOL_MAX', 5))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    MYSQL_POOL_RECYCLE = int(os.getenv('MYSQL_POOL_RECYCLE', 3600))  # seconds before a connection is replaced
+    MYSQL_POOL_PRE_PING = os.getenv('MYSQL_POOL_PRE_PING', 'True').lower() == 'true'  # ping on checkout
     
     # Security settings
     WTF_CSRF_ENABLED = True
@@ -20,6 +29,40 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
 
+    # Query instrumentation settings
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))  # queries at least this slow are logged
+    DB_TIMING_HEADERS = os.getenv('DB_TIMING_HEADERS', 'True').lower() == 'true'  # X-DB-Queries / Server-Timing headers
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'  # serve /metrics in Prometheus format
+
+    # Page settings
+    LEAGUE_PAGE_SIZE = int(os.getenv('LEAGUE_PAGE_SIZE', 50))  # members per page of the league predictions grid
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 256))  # rendered league pages kept per worker
+    API_MAX_AGE = int(os.getenv('API_MAX_AGE', 60))  # seconds browsers and proxies may reuse /api/matchups before kickoff
+
+    # Shared cache settings
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'local')  # 'local', 'file:<directory>' or a redis:// URL
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 3600))  # seconds a cached page fragment is kept
+
+    # Scoreboard settings
+    SCOREBOARD_SOURCE = os.getenv('SCOREBOARD_SOURCE', 'espn')  # 'espn', 'file:<path>' or 'replay:<directory>'
+    SCOREBOARD_REPLAY_INTERVAL = int(os.getenv('SCOREBOARD_REPLAY_INTERVAL', 60))  # seconds per replay snapshot
+    SCOREBOARD_TIMEOUT = float(os.getenv('SCOREBOARD_TIMEOUT', 10))  # seconds per ESPN request
+    SCOREBOARD_RETRIES = int(os.getenv('SCOREBOARD_RETRIES', 2))  # extra attempts, with jittered backoff
+    SCOREBOARD_BREAKER_THRESHOLD = int(os.getenv('SCOREBOARD_BREAKER_THRESHOLD', 3))  # failed fetches before the circuit opens
+    SCOREBOARD_BREAKER_RESET = int(os.getenv('SCOREBOARD_BREAKER_RESET', 60))  # seconds the last good scoreboard is served
+    SCOREBOARD_CACHE_TTL = int(os.getenv('SCOREBOARD_CACHE_TTL', 30))  # seconds before a refresh
+    SCOREBOARD_STALE_TTL = int(os.getenv('SCOREBOARD_STALE_TTL', 300))  # seconds stale data may be served while refreshing
+    SCOREBOARD_CACHE_FILE = os.getenv('SCOREBOARD_CACHE_FILE')  # shared across worker processes when set
+    SCOREBOARD_ARCHIVE_DIR = os.getenv('SCOREBOARD_ARCHIVE_DIR')  # columnar snapshot archive, off when unset
+    LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', 15))  # seconds between live score polls while clients watch
+    LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', 15))  # keep-alive comment interval on /live
+    LIVE_MAX_STREAMS = int(os.getenv('LIVE_MAX_STREAMS', 4))  # /live streams per worker, each holds a thread; other pages poll /api/matchups
+
+    # Scoring worker settings
+    SCORING_WORKER_ENABLED = os.getenv('SCORING_WORKER_ENABLED', 'False').lower() == 'true'  # run the scorer inside the web process
+    SCORING_INTERVAL = int(os.getenv('SCORING_INTERVAL', 60))  # seconds between scoreboard polls
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 5000))  # rows moved or deleted per transaction after a week is sealed
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
@@ -34,6 +77,13 @@ class ProductionConfig(Config):
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Strict'
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutes in production
+    DB_TIMING_HEADERS = os.getenv('DB_TIMING_HEADERS', 'False').lower() == 'true'
+
+    # Production workers run threaded, so each one keeps a warm pool; gunicorn.conf.py sizes
+    # MYSQL_POOL_MAX to its threads (GUNICORN_THREADS - LIVE_MAX_STREAMS + 1), under another
+    # server keep it at least the request threads per process or requests wait for a connection
+    MYSQL_POOL_MIN = int(os.getenv('MYSQL_POOL_MIN', 2))
+    MYSQL_POOL_MAX = int(os.getenv('MYSQL_POOL_MAX', 10))
 
 # Configuration dictionary
 config = {
@@ -1,5 +1,6 @@
 -- NFL Predictions Database Tables
 -- Run this script after creating the nfl_predictions database
+-- Requires MySQL 8.0+ (standings use RANK() window functions)
 
 USE nfl_predictions;
 
@@ -16,7 +17,9 @@ CREATE TABLE brycegayan_leagues (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     join_code VARCHAR(50) UNIQUE NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    version INT DEFAULT 0, -- bumped when membership changes, retires cached league pages
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Users-Leagues relationship table
@@ -25,10 +28,12 @@ CREATE TABLE brycegayan_users_leagues (
     user_id INT NOT NULL,
     league_id INT NOT NULL,
     score INT DEFAULT 0,
+    base_score INT DEFAULT 0, -- points from before the score ledger existed
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
     FOREIGN KEY (league_id) REFERENCES brycegayan_leagues(id) ON DELETE CASCADE,
-    UNIQUE KEY unique_user_league (user_id, league_id)
+    UNIQUE KEY unique_user_league (user_id, league_id), -- a user's leagues, scoring updates by user_id
+    INDEX idx_league_standings (league_id, score, user_id) -- covers standings, places and league members
 );
 
 -- Submitted predictions table
@@ -40,10 +45,29 @@ CREATE TABLE brycegayan_predictions (
     team2 VARCHAR(10) NOT NULL,
     score2 INT NOT NULL,
     week INT NOT NULL,
+    season INT NOT NULL DEFAULT 0, -- the week's season and season type, recorded when the slate is submitted
+    season_type TINYINT NOT NULL DEFAULT 2,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
-    INDEX idx_user_week (user_id, week),
-    INDEX idx_week (week)
+    UNIQUE KEY unique_user_week_game (user_id, season, season_type, week, team1),
+    INDEX idx_week_picks (season, season_type, week, user_id, team1, team2, score1, score2) -- covers scoring reads and the league grid
+);
+
+-- Predictions of past weeks, moved out of brycegayan_predictions in batches once a later week is sealed
+CREATE TABLE brycegayan_predictions_archive (
+    id INT PRIMARY KEY, -- the row's id in brycegayan_predictions
+    season INT NOT NULL,
+    season_type TINYINT NOT NULL DEFAULT 2,
+    user_id INT NOT NULL,
+    team1 VARCHAR(10) NOT NULL,
+    score1 INT NOT NULL,
+    team2 VARCHAR(10) NOT NULL,
+    score2 INT NOT NULL,
+    week INT NOT NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
+    INDEX idx_season_week_picks (season, season_type, week, user_id, team1, team2, score1, score2)
 );
 
 -- Saved predictions table
@@ -57,19 +81,67 @@ CREATE TABLE brycegayan_savedpredictions (
     week INT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
-    INDEX idx_user_week (user_id, week),
+    UNIQUE KEY unique_user_week_game (user_id, week, team1),
     INDEX idx_week (week)
 );
 
+-- Score ledger, one row per user per scored week. League standings are the sum of
+-- base_score plus ROUND(score) over the weeks scored after the user joined (flask verify-standings)
+CREATE TABLE brycegayan_user_week_scores (
+    user_id INT NOT NULL,
+    season INT NOT NULL,
+    season_type TINYINT NOT NULL DEFAULT 2, -- ESPN's 1 preseason, 2 regular season, 3 postseason
+    week INT NOT NULL,
+    score DECIMAL(6,1) NOT NULL,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, season, season_type, week),
+    FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
+    INDEX idx_season_week (season, season_type, week)
+);
+
+-- Games already counted in the score ledger, with the final score they were scored at
+CREATE TABLE brycegayan_scored_games (
+    season INT NOT NULL,
+    season_type TINYINT NOT NULL DEFAULT 2,
+    week INT NOT NULL,
+    team1 VARCHAR(10) NOT NULL,
+    team2 VARCHAR(10) NOT NULL,
+    score1 INT NOT NULL,
+    score2 INT NOT NULL,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season, season_type, week, team1)
+);
+
 -- Application info table
 CREATE TABLE brycegayan_info (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    recentWeek INT DEFAULT 0,
+    recentWeek INT DEFAULT 0, -- the last sealed week, with its season and season type
+    recentSeason INT DEFAULT 0,
+    recentSeasonType TINYINT DEFAULT 2,
+    scoringVersion INT DEFAULT 0, -- bumped by every scoring run, retires cached standings
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- Schema migrations applied to this database (flask migrate), a fresh install is already current
+CREATE TABLE brycegayan_schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Insert initial data
 INSERT INTO brycegayan_info (recentWeek) VALUES (0);
+INSERT INTO brycegayan_schema_migrations (version, name) VALUES
+    (1, 'league_score_index'),
+    (2, 'unique_predictions'),
+    (3, 'cache_versions'),
+    (4, 'score_ledger'),
+    (5, 'scored_games'),
+    (6, 'covering_indexes'),
+    (7, 'predictions_archive'),
+    (8, 'season_types'),
+    (9, 'prediction_seasons');
 
 -- Verify tables were created
 SHOW TABLES; 
\ No newline at end of file
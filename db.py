@@ -0,0 +1,315 @@
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections for one worker process.
+
+    minSize connections are opened up front and at most maxSize exist at once.
+    Connections older than recycle seconds are replaced, and with prePing each
+    one is pinged on checkout so a connection the server dropped never reaches
+    a request.
+    """
+
+    def __init__(self, connect, minSize=1, maxSize=10, timeout=5, recycle=3600, prePing=True):
+        self.connect = connect
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.timeout = timeout
+        self.recycle = recycle
+        self.prePing = prePing
+        self._idle = []  # (connection, openedAt), most recently used last
+        self._openedAt = {}
+        self._size = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._acquires = 0
+        self._timeouts = 0
+        self._acquireSeconds = 0.0
+        self._maxAcquireSeconds = 0.0
+        for i in range(minSize):
+            self._idle.append(self._open())
+
+    def _open(self):
+        conn = self.connect()
+        openedAt = time.time()
+        self._openedAt[id(conn)] = openedAt
+        with self._cond:
+            self._size += 1
+        return conn, openedAt
+
+    def _discard(self, conn):
+        self._openedAt.pop(id(conn), None)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._size >= self.maxSize:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+                entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    self._size += 1  # reserve the slot before connecting outside the lock
+            finally:
+                self._waiting -= 1
+
+        if entry is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self._openedAt[id(conn)] = time.time()
+        else:
+            conn = self._checkout(entry)
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._acquires += 1
+            self._acquireSeconds += elapsed
+            self._maxAcquireSeconds = max(self._maxAcquireSeconds, elapsed)
+        return conn
+
+    def _checkout(self, entry):
+        conn, openedAt = entry
+        stale = self.recycle and time.time() - openedAt > self.recycle
+        if not stale and self.prePing:
+            try:
+                conn.ping()
+            except Exception as e:
+                logger.warning(f"Dropping dead pooled connection: {str(e)}")
+                stale = True
+        if not stale:
+            return conn
+        # replace it in the same pool slot
+        self._openedAt.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._openedAt[id(conn)] = time.time()
+        return conn
+
+    def release(self, conn):
+        try:
+            conn.rollback()  # never hand an open transaction to the next request
+        except Exception as e:
+            logger.warning(f"Dropping pooled connection that failed to reset: {str(e)}")
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, self._openedAt.get(id(conn), time.time())))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, openedAt in idle:
+            self._discard(conn)
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'max_size': self.maxSize,
+                'acquires': self._acquires,
+                'acquire_timeouts': self._timeouts,
+                'acquire_seconds_total': self._acquireSeconds,
+                'acquire_seconds_max': self._maxAcquireSeconds,
+            }
+
+
+class MySQLPool:
+    """Flask extension handing each app context one pooled MySQL connection.
+
+    Drop-in for flask_mysqldb's MySQL: mysql.connection checks a connection out
+    on first use and it goes back to the pool when the app context tears down.
+    The pool itself is created lazily per process, so it is safe to fork after
+    import (gunicorn --preload).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_POOL_MIN', 1)
+        app.config.setdefault('MYSQL_POOL_MAX', 10)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 5)
+        app.config.setdefault('MYSQL_POOL_RECYCLE', 3600)
+        app.config.setdefault('MYSQL_POOL_PRE_PING', True)
+        app.teardown_appcontext(self.teardown)
+
+    def connect(self):
+        import MySQLdb
+        import MySQLdb.cursors
+
+        config = self.app.config
+        return MySQLdb.connect(
+            host=config['MYSQL_HOST'], user=config['MYSQL_USER'], passwd=config['MYSQL_PASSWORD'],
+            db=config['MYSQL_DB'], port=int(config['MYSQL_PORT']), charset=config['MYSQL_CHARSET'],
+            cursorclass=getattr(MySQLdb.cursors, config.get('MYSQL_CURSORCLASS') or 'Cursor'))
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                config = self.app.config
+                self._pool = ConnectionPool(
+                    self.connect, minSize=config['MYSQL_POOL_MIN'], maxSize=config['MYSQL_POOL_MAX'],
+                    timeout=config['MYSQL_POOL_TIMEOUT'], recycle=config['MYSQL_POOL_RECYCLE'],
+                    prePing=config['MYSQL_POOL_PRE_PING'])
+                self._pid = os.getpid()
+            return self._pool
+
+    def close(self):
+        # drops the process pool, the next checkout builds a fresh one
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+
+    @property
+    def connection(self):
+        if 'mysqlConnection' not in g:
+            g.mysqlConnection = self.pool.acquire()
+        return g.mysqlConnection
+
+    def teardown(self, exception):
+        conn = g.pop('mysqlConnection', None)
+        if conn is not None:
+            self.pool.release(conn)
+
+
+class QueryStats:
+    """Per-statement timings for every query the app runs, keyed by normalized SQL"""
+
+    def __init__(self, slowSeconds=0.2):
+        self.slowSeconds = slowSeconds
+        self._statements = {}  # normalized sql -> [count, totalSeconds, maxSeconds]
+        self._slow = 0
+        self._lock = threading.Lock()
+
+    def record(self, query, seconds):
+        statement = normalizeQuery(query)
+        with self._lock:
+            stats = self._statements.setdefault(statement, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if seconds >= self.slowSeconds:
+                self._slow += 1
+        if seconds >= self.slowSeconds:
+            logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {statement}")
+        if has_app_context():
+            g.dbQueries = g.get('dbQueries', 0) + 1
+            g.dbSeconds = g.get('dbSeconds', 0.0) + seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {statement: tuple(stats) for statement, stats in self._statements.items()}, self._slow
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow = 0
+
+
+def normalizeQuery(query):
+    # collapse whitespace, literals and multi-row VALUES lists so equivalent statements share a key
+    query = re.sub(r'\s+', ' ', query).strip()
+    query = re.sub(r"'(?:[^'\\]|\\.)*'", '?', query)
+    query = re.sub(r'\b\d+\b', '?', query)
+    query = re.sub(r'%s', '?', query)
+    query = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+', '(...)', query)
+    return re.sub(r'IN \(\s*\?(?:\s*,\s*\?)*\s*\)', 'IN (...)', query, flags=re.I)
+
+
+def timedExecute(stats, cursor, query, queryVars=None, many=False):
+    start = time.perf_counter()
+    try:
+        if many:
+            return cursor.executemany(query, queryVars)
+        return cursor.execute(query, queryVars)
+    finally:
+        stats.record(query, time.perf_counter() - start)
+
+
+def prometheusText(stats, pool=None):
+    """Query and pool metrics in the Prometheus text exposition format"""
+    statements, slow = stats.snapshot()
+    lines = [
+        '# HELP nfl_db_queries_total Queries executed, by normalized statement.',
+        '# TYPE nfl_db_queries_total counter',
+    ]
+    for statement, (count, total, longest) in statements.items():
+        lines.append(f'nfl_db_queries_total{{statement="{escapeLabel(statement)}"}} {count}')
+    lines += [
+        '# HELP nfl_db_query_seconds_total Time spent executing queries, by normalized statement.',
+        '# TYPE nfl_db_query_seconds_total counter',
+    ]
+    for statement, (count, total, longest) in statements.items():
+        lines.append(f'nfl_db_query_seconds_total{{statement="{escapeLabel(statement)}"}} {total:.6f}')
+    lines += [
+        '# HELP nfl_db_query_seconds_max Slowest execution, by normalized statement.',
+        '# TYPE nfl_db_query_seconds_max gauge',
+    ]
+    for statement, (count, total, longest) in statements.items():
+        lines.append(f'nfl_db_query_seconds_max{{statement="{escapeLabel(statement)}"}} {longest:.6f}')
+    lines += [
+        '# HELP nfl_db_slow_queries_total Queries slower than the slow query threshold.',
+        '# TYPE nfl_db_slow_queries_total counter',
+        f'nfl_db_slow_queries_total {slow}',
+    ]
+    if pool is not None:
+        for name, value in pool.metrics().items():
+            kind = 'counter' if name in ('acquires', 'acquire_timeouts', 'acquire_seconds_total') else 'gauge'
+            lines += [f'# TYPE nfl_db_pool_{name} {kind}', f'nfl_db_pool_{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def escapeLabel(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
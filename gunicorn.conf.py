@@ -0,0 +1,36 @@
+"""Gunicorn settings, tuned through the environment: gunicorn -c gunicorn.conf.py wsgi:app"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 8000)}")
+
+# one process per core for the Python work, threads for requests waiting on MySQL and ESPN
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# every worker builds its own app after the fork, so pools and poller threads are never shared by accident
+preload_app = False
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# an open /live stream holds a thread for as long as the tab is open, so at most a quarter of them
+# stream; past that live.js polls the ETag'd /api/matchups instead
+os.environ.setdefault('LIVE_MAX_STREAMS', str(max(1, threads // 4)))
+
+# every other thread may hold a pooled connection at once, plus the scoring worker's; a smaller pool
+# makes requests queue for up to MYSQL_POOL_TIMEOUT. workers * MYSQL_POOL_MAX must stay under max_connections
+os.environ.setdefault('MYSQL_POOL_MAX', str(threads - int(os.environ['LIVE_MAX_STREAMS']) + 1))
+
+# workers share one scoreboard fetch and one page cache unless configured otherwise; both live in a
+# directory private to this user (created 0700, refused if someone else owns it or can write to it)
+sharedDirectory = os.path.join(tempfile.gettempdir(), f"nfl-{os.getuid()}")
+os.environ.setdefault('SCOREBOARD_CACHE_FILE', os.path.join(sharedDirectory, 'scoreboard.json'))
+os.environ.setdefault('CACHE_BACKEND', f"file:{sharedDirectory}")
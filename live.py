@@ -0,0 +1,160 @@
+"""One scoreboard poller per process, fanned out to browsers as server-sent events.
+
+LivePoller reads the scoreboard on a fixed interval while anyone is subscribed
+and publishes only the games whose score or status changed. However many
+clients are connected, the upstream is read once per interval (and through
+ScoreboardCache, at most once per TTL across all processes).
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A connected client's queue of (id, event, data) messages"""
+
+    def __init__(self, maxQueue):
+        self.queue = queue.Queue(maxQueue)
+        self.dropped = False  # set when the client fell too far behind
+
+
+class LivePoller:
+    """Background thread diffing successive scoreboards for subscribers.
+
+    load returns the current Scoreboard. The last backlog change events are
+    kept so a reconnecting EventSource (Last-Event-ID) resumes without
+    missing any, a subscriber that lets maxQueue messages pile up is dropped.
+    Every open stream holds a web worker thread, so at most maxSubscribers
+    (None for no limit) are accepted at once.
+    """
+
+    def __init__(self, load, interval=15, backlog=256, maxQueue=64, maxSubscribers=None):
+        self.load = load
+        self.interval = interval
+        self.maxQueue = maxQueue
+        self.maxSubscribers = maxSubscribers
+        self._board = None
+        # event ids carry a per-process token, an id from another worker never resumes here
+        self._token = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._lastId = 0
+        self._backlog = deque(maxlen=backlog)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, lastEventId=None):
+        """Register a client, queueing either the missed changes or a full snapshot; None when full"""
+        self._ensureRunning()
+        subscription = Subscription(self.maxQueue)
+        resumeFrom = self._parseId(lastEventId)
+        with self._lock:
+            if self.maxSubscribers is not None and len(self._subscribers) >= self.maxSubscribers:
+                return None
+            if self._board is not None and self._canResume(resumeFrom):
+                for message in self._backlog:
+                    if message[0] > resumeFrom:
+                        subscription.queue.put_nowait(message)
+            elif self._board is not None:
+                subscription.queue.put_nowait(self._snapshot())
+            self._subscribers.add(subscription)
+        self._wake.set()  # the first subscriber shouldn't wait a whole interval for data
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def poll(self):
+        """Read the scoreboard once and publish what changed, returns the number of changed games"""
+        board = self.load()
+        with self._lock:
+            previous, self._board = self._board, board
+            if previous is None:
+                self._publish(self._snapshot())
+                return len(board)
+            changes = diffScoreboards(previous, board)
+            if changes:
+                self._lastId = next(self._ids)
+                message = (self._lastId, 'scores', changes)
+                self._backlog.append(message)
+                self._publish(message)
+            return len(changes)
+
+    def stream(self, subscription, heartbeat=15):
+        """SSE text for one client, ends when the client is dropped or disconnects"""
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while not subscription.dropped:
+                try:
+                    eventId, event, data = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'  # also how a closed connection is noticed
+                    continue
+                yield formatEvent(f"{self._token}-{eventId}", event, data)
+        finally:
+            self.unsubscribe(subscription)
+
+    def _snapshot(self):
+        return (self._lastId, 'snapshot', [gameData(game) for game in self._board.games])
+
+    def _publish(self, message):
+        # called with the lock held
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                subscription.dropped = True
+                self._subscribers.discard(subscription)
+
+    def _parseId(self, lastEventId):
+        token, _, number = (lastEventId or '').partition('-')
+        return int(number) if token == self._token and number.isdigit() else None
+
+    def _canResume(self, resumeFrom):
+        # the backlog still holds every change after resumeFrom
+        if resumeFrom is None or resumeFrom > self._lastId:
+            return False
+        return resumeFrom == self._lastId or (len(self._backlog) > 0 and self._backlog[0][0] <= resumeFrom + 1)
+
+    def _ensureRunning(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-poller', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            if self.subscribers():
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.warning(f"Live scoreboard poll failed: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def gameData(game):
+    return {'id': game.id, 'team1': game.team1, 'team2': game.team2, 'score1': game.score1,
+            'score2': game.score2, 'state': game.state, 'completed': game.completed}
+
+
+def diffScoreboards(old, new):
+    """Games (as dicts) that are new or whose score or status changed"""
+    before = {game.id: gameData(game) for game in old.games}
+    return [data for data in map(gameData, new.games) if before.get(data['id']) != data]
+
+
+def formatEvent(eventId, event, data):
+    return f"id: {eventId}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
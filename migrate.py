@@ -0,0 +1,77 @@
+"""Versioned schema migrations.
+
+create_tables.sql always holds the current schema for new databases. Each change
+to it also lands as migrations/NNN_<name>.sql, which brings an existing database
+up to date. Applied versions are recorded in brycegayan_schema_migrations
+(create_tables.sql records them all), so `flask migrate` only runs what is new.
+
+MySQL commits DDL as it goes, so a migration that fails halfway is not rolled
+back: fix the database by hand, then rerun or --mark-applied it.
+"""
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+LOCK_NAME = 'brycegayan_migrate'
+
+
+def readMigrations(directory=MIGRATIONS_DIR):
+    """(version, name, path) for every migration file, in version order"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.match(r'(\d+)_(\w+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, name, path in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def splitStatements(sql):
+    # migrations are plain DDL/DML, no procedures, so ; always ends a statement
+    sql = re.sub(r'--[^\n]*', '', sql)
+    return [statement.strip() for statement in sql.split(';') if statement.strip()]
+
+
+def appliedVersions(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS brycegayan_schema_migrations (
+        version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+    cursor.execute('SELECT version FROM brycegayan_schema_migrations')
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def pendingMigrations(cursor, directory=MIGRATIONS_DIR):
+    applied = appliedVersions(cursor)
+    return [migration for migration in readMigrations(directory) if migration[0] not in applied]
+
+
+def migrate(connection, directory=MIGRATIONS_DIR, markOnly=None):
+    """Apply pending migrations in order, returns the (version, name) pairs applied.
+
+    With markOnly=VERSION, migrations up to VERSION are recorded without running
+    them (for databases created from an older create_tables.sql).
+    """
+    cursor = connection.cursor()
+    cursor.execute('SELECT GET_LOCK(%s, 30) AS locked', (LOCK_NAME,))
+    if not cursor.fetchone()['locked']:
+        raise RuntimeError('Another migration is running')
+    try:
+        applied = []
+        for version, name, path in pendingMigrations(cursor, directory):
+            if markOnly is not None and version > markOnly:
+                break
+            if markOnly is None:
+                with open(path) as f:
+                    for statement in splitStatements(f.read()):
+                        cursor.execute(statement)
+            cursor.execute('INSERT INTO brycegayan_schema_migrations(version, name) VALUES (%s, %s)', (version, name))
+            connection.commit()
+            applied.append((version, name))
+        return applied
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
@@ -0,0 +1,2 @@
+-- Standings and places are ranked per league by score
+ALTER TABLE brycegayan_users_leagues ADD INDEX idx_league_score (league_id, score);
@@ -0,0 +1,13 @@
+-- One prediction per user, week and game, so slates can be written with ON DUPLICATE KEY UPDATE.
+-- Duplicates left by double submits are removed first, keeping the newest row.
+DELETE p FROM brycegayan_predictions p JOIN brycegayan_predictions newer
+    ON newer.user_id = p.user_id AND newer.week = p.week AND newer.team1 = p.team1 AND newer.id > p.id;
+DELETE p FROM brycegayan_savedpredictions p JOIN brycegayan_savedpredictions newer
+    ON newer.user_id = p.user_id AND newer.week = p.week AND newer.team1 = p.team1 AND newer.id > p.id;
+
+ALTER TABLE brycegayan_predictions
+    ADD UNIQUE KEY unique_user_week_game (user_id, week, team1),
+    DROP INDEX idx_user_week;
+ALTER TABLE brycegayan_savedpredictions
+    ADD UNIQUE KEY unique_user_week_game (user_id, week, team1),
+    DROP INDEX idx_user_week;
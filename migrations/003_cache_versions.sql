@@ -0,0 +1,5 @@
+-- Version counters that cached standings and league pages are keyed on
+ALTER TABLE brycegayan_info ADD scoringVersion INT DEFAULT 0 AFTER recentWeek;
+ALTER TABLE brycegayan_leagues
+    ADD version INT DEFAULT 0 AFTER join_code,
+    ADD updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
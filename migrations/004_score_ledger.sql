@@ -0,0 +1,15 @@
+-- Per-week score ledger. Standings scored before it existed are carried over as base_score.
+ALTER TABLE brycegayan_users_leagues ADD base_score INT DEFAULT 0 AFTER score;
+UPDATE brycegayan_users_leagues SET base_score = score;
+
+CREATE TABLE brycegayan_user_week_scores (
+    user_id INT NOT NULL,
+    season INT NOT NULL,
+    week INT NOT NULL,
+    score DECIMAL(6,1) NOT NULL,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, season, week),
+    FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
+    INDEX idx_season_week (season, week)
+);
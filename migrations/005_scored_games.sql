@@ -0,0 +1,11 @@
+-- Games already counted in the score ledger, so live scoring only adds newly final games
+CREATE TABLE brycegayan_scored_games (
+    season INT NOT NULL,
+    week INT NOT NULL,
+    team1 VARCHAR(10) NOT NULL,
+    team2 VARCHAR(10) NOT NULL,
+    score1 INT NOT NULL,
+    score2 INT NOT NULL,
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (season, week, team1)
+);
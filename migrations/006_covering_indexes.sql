@@ -0,0 +1,9 @@
+-- Covering indexes for the hot reads (python -m bench.explain checks them).
+-- Standings, places and the league member page read (league_id, score, user_id) only.
+ALTER TABLE brycegayan_users_leagues
+    ADD INDEX idx_league_standings (league_id, score, user_id),
+    DROP INDEX idx_league_score;
+-- Scoring reads a whole week's picks and the league grid a page of members' picks for the week
+ALTER TABLE brycegayan_predictions
+    ADD INDEX idx_week_picks (week, user_id, team1, team2, score1, score2),
+    DROP INDEX idx_week;
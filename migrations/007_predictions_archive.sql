@@ -0,0 +1,16 @@
+-- Sealed weeks' predictions move here in batches (see archivePredictions), keeping brycegayan_predictions
+-- down to the weeks still in play. InnoDB partitions can't carry the user_id foreign key, so it is a table.
+CREATE TABLE brycegayan_predictions_archive (
+    id INT PRIMARY KEY, -- the row's id in brycegayan_predictions
+    season INT NOT NULL,
+    user_id INT NOT NULL,
+    team1 VARCHAR(10) NOT NULL,
+    score1 INT NOT NULL,
+    team2 VARCHAR(10) NOT NULL,
+    score2 INT NOT NULL,
+    week INT NOT NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES brycegayan_users(id) ON DELETE CASCADE,
+    INDEX idx_season_week_picks (season, week, user_id, team1, team2, score1, score2)
+);
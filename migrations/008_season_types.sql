@@ -0,0 +1,19 @@
+-- ESPN numbers postseason weeks from 1 again within the same season, so scored weeks are keyed by
+-- season type (1 preseason, 2 regular season, 3 postseason) as well as season and week.
+-- Rows from before are taken as regular season, except weeks 1-5 scored in January or February,
+-- which can only have been the postseason. A postseason week that was scored over the regular
+-- season week of the same number has to be put right with flask rescore-week and verify-standings.
+ALTER TABLE brycegayan_user_week_scores ADD season_type TINYINT NOT NULL DEFAULT 2 AFTER season,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (user_id, season, season_type, week),
+    DROP INDEX idx_season_week, ADD INDEX idx_season_week (season, season_type, week);
+UPDATE brycegayan_user_week_scores SET season_type = 3 WHERE week <= 5 AND MONTH(scored_at) IN (1, 2);
+
+ALTER TABLE brycegayan_scored_games ADD season_type TINYINT NOT NULL DEFAULT 2 AFTER season,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (season, season_type, week, team1);
+UPDATE brycegayan_scored_games SET season_type = 3 WHERE week <= 5 AND MONTH(scored_at) IN (1, 2);
+
+-- the sealed week's season is taken from when it was sealed, a season runs from September to February
+ALTER TABLE brycegayan_info ADD recentSeason INT DEFAULT 0 AFTER recentWeek,
+    ADD recentSeasonType TINYINT DEFAULT 2 AFTER recentSeason;
+UPDATE brycegayan_info SET recentSeason = YEAR(updated_at) - (MONTH(updated_at) < 3),
+    recentSeasonType = IF(recentWeek <= 5 AND MONTH(updated_at) IN (1, 2), 3, 2) WHERE recentWeek > 0;
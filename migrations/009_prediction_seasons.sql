@@ -0,0 +1,21 @@
+-- Submitted predictions record the season and season type they were made for, so archiving a sealed
+-- week no longer infers them from week order (postseason weeks are numbered from 1 again).
+-- Rows from before take them from when they were made: a season runs from September to February,
+-- and weeks 1-5 picked in January or February can only be postseason weeks.
+ALTER TABLE brycegayan_predictions ADD season INT NOT NULL DEFAULT 0 AFTER week,
+    ADD season_type TINYINT NOT NULL DEFAULT 2 AFTER season;
+UPDATE brycegayan_predictions SET season = YEAR(created_at) - (MONTH(created_at) < 3),
+    season_type = IF(week <= 5 AND MONTH(created_at) IN (1, 2), 3, 2);
+ALTER TABLE brycegayan_predictions
+    ADD UNIQUE KEY unique_user_season_week_game (user_id, season, season_type, week, team1),
+    DROP INDEX unique_user_week_game,
+    DROP INDEX idx_week_picks,
+    ADD INDEX idx_week_picks (season, season_type, week, user_id, team1, team2, score1, score2);
+ALTER TABLE brycegayan_predictions RENAME INDEX unique_user_season_week_game TO unique_user_week_game;
+
+-- archived rows were tagged with a season inferred from week order, wrong for the postseason
+ALTER TABLE brycegayan_predictions_archive ADD season_type TINYINT NOT NULL DEFAULT 2 AFTER season;
+UPDATE brycegayan_predictions_archive SET season = YEAR(created_at) - (MONTH(created_at) < 3),
+    season_type = IF(week <= 5 AND MONTH(created_at) IN (1, 2), 3, 2) WHERE created_at IS NOT NULL;
+ALTER TABLE brycegayan_predictions_archive DROP INDEX idx_season_week_picks,
+    ADD INDEX idx_season_week_picks (season, season_type, week, user_id, team1, team2, score1, score2);
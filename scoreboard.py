@@ -0,0 +1,472 @@
+import argparse
+import copy
+from array import array
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+
+from cache import privateDirectory
+
+logger = logging.getLogger(__name__)
+
+ESPN_SCOREBOARD_URL = 'https://site.web.api.espn.com/apis/v2/scoreboard/header?sport=football&league=nfl'
+# ESPN seasonType values
+PRESEASON, REGULAR_SEASON, POSTSEASON = 1, 2, 3
+
+
+class CircuitOpenError(Exception):
+    """Raised when the upstream circuit is open and there is no snapshot to fall back on"""
+
+
+class EspnSource:
+    """Live scoreboard from the ESPN API.
+
+    Requests reuse one keep-alive session and are conditional (ETag /
+    If-Modified-Since), so an unchanged scoreboard costs a 304 and hands back the
+    same payload object. Failed attempts are retried with jittered exponential
+    backoff. After failureThreshold failed fetches in a row the circuit opens:
+    for resetAfter seconds the last good payload is served without calling ESPN,
+    then a single trial fetch decides whether it closes again.
+    """
+
+    def __init__(self, url=ESPN_SCOREBOARD_URL, timeout=10, retries=2, backoff=0.5,
+                 failureThreshold=3, resetAfter=60, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failureThreshold = failureThreshold
+        self.resetAfter = resetAfter
+        self.session = session or requests.Session()
+        self.lastPayload = None
+        self._etag = None
+        self._lastModified = None
+        self._failures = 0
+        self._openedAt = None
+
+    def fetch(self):
+        if self._circuitOpen():
+            return self._fallback()
+        for attempt in range(self.retries + 1):
+            try:
+                return self._attempt()
+            except requests.RequestException as e:
+                logger.error(f"ESPN API error (attempt {attempt + 1}): {str(e)}")
+                if attempt < self.retries:
+                    time.sleep(self.retryDelay(attempt))
+        self._recordFailure()
+        return self._fallback()
+
+    def retryDelay(self, attempt):
+        # full jitter so workers that failed together don't retry together
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _attempt(self):
+        headers = {}
+        if self.lastPayload is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._lastModified:
+                headers['If-Modified-Since'] = self._lastModified
+        response = self.session.get(self.url, timeout=self.timeout, headers=headers)
+        if response.status_code == 304 and self.lastPayload is not None:
+            self._recordSuccess()
+            return self.lastPayload
+        response.raise_for_status()
+        payload = response.json()
+        self._etag = response.headers.get('ETag')
+        self._lastModified = response.headers.get('Last-Modified')
+        self.lastPayload = payload
+        self._recordSuccess()
+        return payload
+
+    def _circuitOpen(self):
+        if self._openedAt is None:
+            return False
+        if time.time() - self._openedAt >= self.resetAfter:
+            return False  # half open: let the next fetch through as a trial
+        return True
+
+    def _recordSuccess(self):
+        if self._openedAt is not None:
+            logger.info("ESPN API recovered, closing circuit")
+        self._failures = 0
+        self._openedAt = None
+
+    def _recordFailure(self):
+        self._failures += 1
+        if self._failures >= self.failureThreshold:
+            if self._openedAt is None:
+                logger.warning(f"ESPN API failed {self._failures} times in a row, opening circuit for {self.resetAfter}s")
+            self._openedAt = time.time()
+
+    def _fallback(self):
+        if self.lastPayload is None:
+            raise CircuitOpenError('ESPN API unavailable and no scoreboard has been fetched yet')
+        return self.lastPayload
+
+
+class FileSource:
+    """Scoreboard read from a local JSON file, e.g. static/14November9_08_NFL_Scoreboard.json"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class ReplaySource:
+    """Steps through a directory of scoreboard snapshots in file name order.
+
+    Each snapshot is served for interval seconds, counted from the first fetch.
+    The last snapshot is served forever once reached, unless loop is set.
+    """
+
+    def __init__(self, directory, interval=60, loop=False):
+        self.paths = sorted(os.path.join(directory, name)
+                            for name in os.listdir(directory) if name.endswith('.json'))
+        if not self.paths:
+            raise ValueError(f"No .json scoreboard snapshots in {directory}")
+        self.interval = interval
+        self.loop = loop
+        self.startedAt = None
+        self._snapshots = {}
+
+    def step(self):
+        if self.startedAt is None:
+            self.startedAt = time.time()
+        step = int((time.time() - self.startedAt) / self.interval) if self.interval > 0 else 0
+        if self.loop:
+            return step % len(self.paths)
+        return min(step, len(self.paths) - 1)
+
+    def fetch(self):
+        path = self.paths[self.step()]
+        if path not in self._snapshots:
+            with open(path) as f:
+                self._snapshots[path] = json.load(f)
+        # callers may hold on to the payload, so hand out a copy
+        return copy.deepcopy(self._snapshots[path])
+
+
+def makeSource(spec, timeout=10, replayInterval=60, retries=2, failureThreshold=3, resetAfter=60):
+    """Build a scoreboard source from a spec: 'espn[:<url>]', 'file:<path>' or 'replay:<directory>'"""
+    kind, _, target = (spec or 'espn').partition(':')
+    if kind == 'espn':
+        return EspnSource(target or ESPN_SCOREBOARD_URL, timeout=timeout, retries=retries,
+                          failureThreshold=failureThreshold, resetAfter=resetAfter)
+    if kind == 'file':
+        return FileSource(target)
+    if kind == 'replay':
+        return ReplaySource(target, interval=replayInterval)
+    raise ValueError(f"Unknown scoreboard source: {spec}")
+
+
+def writeReplaySnapshots(payload, directory):
+    """Split a completed week's scoreboard into a replay that steps from "pre" to final.
+
+    The first snapshot has every game in "pre". Each following snapshot kicks off the
+    next time slot (those games in progress at half their final score) and completes
+    every earlier slot, ending with the original, fully completed payload.
+    """
+    os.makedirs(directory, exist_ok=True)
+    events = payload['sports'][0]['leagues'][0]['events']
+    slots = sorted({event['date'] for event in events})
+    paths = []
+    for step in range(len(slots) + 2):
+        snapshot = copy.deepcopy(payload)
+        for event in snapshot['sports'][0]['leagues'][0]['events']:
+            slot = slots.index(event['date']) + 1
+            if slot > step:
+                setGameState(event, 'pre')
+            elif slot == step and step <= len(slots):
+                setGameState(event, 'in')
+        path = os.path.join(directory, f"{step:02d}.json")
+        with open(path, 'w') as f:
+            json.dump(snapshot, f)
+        paths.append(path)
+    return paths
+
+
+def setGameState(event, state):
+    # rewrite a completed event as not yet started ('pre') or in progress ('in')
+    event['status'] = state
+    event['fullStatus']['type'].update({
+        'state': state,
+        'completed': False,
+        'id': '1' if state == 'pre' else '2',
+        'name': 'STATUS_SCHEDULED' if state == 'pre' else 'STATUS_IN_PROGRESS',
+        'description': 'Scheduled' if state == 'pre' else 'In Progress',
+        'detail': 'Scheduled' if state == 'pre' else 'Halftime',
+        'shortDetail': 'Scheduled' if state == 'pre' else 'Halftime',
+    })
+    event['summary'] = event['fullStatus']['type']['detail']
+    event['period'] = event['fullStatus']['period'] = 0 if state == 'pre' else 2
+    for competitor in event['competitors']:
+        competitor['score'] = '' if state == 'pre' else str(int(competitor['score'] or 0) // 2)
+        competitor.pop('winner', None)
+
+
+class Game:
+    """One matchup on the scoreboard; team1 is the home team as listed by ESPN"""
+    __slots__ = ('id', 'team1', 'team2', 'score1', 'score2', 'state', 'completed', 'date')
+
+    def __init__(self, id, team1, team2, score1, score2, state, completed, date):
+        self.id = id
+        self.team1 = team1
+        self.team2 = team2
+        self.score1 = score1
+        self.score2 = score2
+        self.state = state
+        self.completed = completed
+        self.date = date
+
+    @property
+    def started(self):
+        return self.state != 'pre'
+
+
+class Scoreboard:
+    """A scoreboard payload parsed once into the fields the app reads.
+
+    matchups holds (team1, team2) tuples in ESPN order, scores1/scores2 are
+    integer arrays aligned with it and gameIndex maps a matchup to its position.
+    ESPN restarts week at 1 for the postseason, so a week is only identified by
+    (season, seasonType, week).
+    """
+    __slots__ = ('games', 'week', 'season', 'seasonType', 'matchups', 'scores1', 'scores2', 'gameIndex', 'started', 'finished')
+
+    def __init__(self, games, week, season, seasonType=REGULAR_SEASON):
+        self.games = games
+        self.week = week
+        self.season = season
+        self.seasonType = seasonType
+        self.matchups = [(game.team1, game.team2) for game in games]
+        self.scores1 = array('i', (game.score1 for game in games))
+        self.scores2 = array('i', (game.score2 for game in games))
+        self.gameIndex = {matchup: i for i, matchup in enumerate(self.matchups)}
+        self.started = any(game.started for game in games)
+        self.finished = all(game.completed for game in games)
+
+    def __len__(self):
+        return len(self.games)
+
+
+def parseScoreboard(payload):
+    events = payload['sports'][0]['leagues'][0]['events']
+    games = []
+    for event in events:
+        home, away = event['competitors'][0], event['competitors'][1]
+        games.append(Game(event['id'], home['abbreviation'], away['abbreviation'],
+                          int(home.get('score') or 0), int(away.get('score') or 0),
+                          event['status'], event['fullStatus']['type']['completed'], event['date']))
+    week = events[0]['week'] if events else None
+    season = events[0].get('season') if events else None
+    seasonType = int(events[0].get('seasonType') or REGULAR_SEASON) if events else REGULAR_SEASON
+    return Scoreboard(games, week, season, seasonType)
+
+
+class ScoreboardCache:
+    """TTL cache in front of the upstream scoreboard fetch.
+
+    Fresh entries (younger than ttl) are served directly. Stale entries (up to
+    ttl + staleTtl old) are served while a single background refresh runs.
+    Anything older blocks on a refresh, and concurrent callers share that one
+    upstream fetch. When path is set, entries are also written to a JSON file
+    so every worker process on the host reads the same snapshot. Each fetched
+    payload goes through parse exactly once per process, and onFetch, if set, is
+    called with (fetchedAt, parsed) for every payload that changed upstream.
+    The file's directory must be private to this user (see privateDirectory).
+    """
+
+    def __init__(self, fetch, ttl=30, staleTtl=300, path=None, parse=parseScoreboard, onFetch=None):
+        self.fetch = fetch
+        self.parse = parse
+        self.onFetch = onFetch
+        self.ttl = ttl
+        self.staleTtl = staleTtl
+        self.path = path
+        if path:
+            # whatever is in the file is served as scores, so nobody else may plant it
+            privateDirectory(os.path.dirname(os.path.abspath(path)))
+        self._entry = None  # (fetchedAt, parsed payload)
+        self._lastPayload = None
+        self._fileMtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        entry = self._current()
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                return entry[1]
+            if age < self.ttl + self.staleTtl:
+                self._refreshInBackground()
+                return entry[1]
+        return self._refresh()
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+            self._fileMtime = None
+            if self.path:
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+
+    def _current(self):
+        if self.path:
+            self._readFile()
+        return self._entry
+
+    def _isFresh(self, entry):
+        return entry is not None and time.time() - entry[0] < self.ttl
+
+    def _refresh(self):
+        # only one thread per process goes upstream, the rest wait and reuse its result
+        with self._lock:
+            entry = self._current()
+            if self._isFresh(entry):
+                return entry[1]
+            if not self._acquireFileLock():
+                # another process is fetching, wait for it to publish
+                entry = self._waitForFile(entry)
+                if entry is not None:
+                    return entry[1]
+                if not self._acquireFileLock(force=True):
+                    raise RuntimeError('Could not acquire scoreboard cache lock')
+            try:
+                return self._fetchAndStore()
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Scoreboard refresh failed, serving stale data: {str(e)}")
+                return entry[1]
+            finally:
+                self._releaseFileLock()
+
+    def _refreshInBackground(self):
+        if not self._lock.acquire(blocking=False):
+            return  # a refresh is already in flight
+        if not self._acquireFileLock():
+            self._lock.release()
+            return
+
+        def run():
+            try:
+                self._fetchAndStore()
+            except Exception as e:
+                logger.warning(f"Background scoreboard refresh failed: {str(e)}")
+            finally:
+                self._releaseFileLock()
+                self._lock.release()
+
+        threading.Thread(target=run, name='scoreboard-refresh', daemon=True).start()
+
+    def _fetchAndStore(self):
+        payload = self.fetch()
+        fetchedAt = time.time()
+        if self._entry is not None and payload is self._lastPayload:
+            parsed = self._entry[1]  # unchanged upstream (e.g. a 304), keep the parsed model
+        else:
+            parsed = self.parse(payload)
+            if self.onFetch is not None:
+                try:
+                    self.onFetch(fetchedAt, parsed)
+                except Exception as e:
+                    logger.warning(f"Scoreboard capture failed: {str(e)}")
+        self._lastPayload = payload
+        self._entry = (fetchedAt, parsed)
+        if self.path:
+            self._writeFile(fetchedAt, payload)
+        return parsed
+
+    # Shared file store
+
+    def _readFile(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._fileMtime:
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable scoreboard cache file: {str(e)}")
+            return
+        self._fileMtime = mtime
+        if self._entry is None or stored['fetchedAt'] > self._entry[0]:
+            self._entry = (stored['fetchedAt'], self.parse(stored['payload']))
+
+    def _writeFile(self, fetchedAt, payload):
+        tmpPath = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmpPath, 'w') as f:
+                json.dump({'fetchedAt': fetchedAt, 'payload': payload}, f)
+            os.replace(tmpPath, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write scoreboard cache file: {str(e)}")
+
+    def _lockPath(self):
+        return self.path + '.lock'
+
+    def _acquireFileLock(self, force=False):
+        if not self.path:
+            return True
+        if force:
+            self._releaseFileLock()
+        try:
+            os.close(os.open(self._lockPath(), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            # a lock left behind by a crashed worker is ignored once it is clearly abandoned
+            try:
+                if time.time() - os.stat(self._lockPath()).st_mtime > 30:
+                    os.remove(self._lockPath())
+                    return self._acquireFileLock()
+            except FileNotFoundError:
+                return self._acquireFileLock()
+            return False
+
+    def _releaseFileLock(self):
+        if not self.path:
+            return
+        try:
+            os.remove(self._lockPath())
+        except FileNotFoundError:
+            pass
+
+    def _waitForFile(self, seen, timeout=15, interval=0.1):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            entry = self._current()
+            if entry is not seen and entry is not None:
+                return entry
+            if not os.path.exists(self._lockPath()):
+                break
+            time.sleep(interval)
+        return seen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scoreboard fixture tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    replayParser = subparsers.add_parser(
+        'make-replay', help='Write a pre -> in progress -> final replay directory from a completed scoreboard')
+    replayParser.add_argument('scoreboard', help='completed scoreboard JSON, e.g. static/14November9_08_NFL_Scoreboard.json')
+    replayParser.add_argument('directory', help='output directory for the numbered snapshots')
+    args = parser.parse_args()
+
+    with open(args.scoreboard) as f:
+        for path in writeReplaySnapshots(json.load(f), args.directory):
+            print(path)
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Points awarded per game, see the Scoring System panel on the home page
+WINNER_POINTS = 10
+TIE_POINTS = 5  # game tied and the user didn't predict a tie
+SPREAD_POINTS = 10  # minus abs(predicted spread - actual spread), floored at 0
+TOTAL_POINTS = 8  # minus 0.5 * abs(predicted points - actual points), floored at 0
+PERFECT_POINTS = 50
+
+
+def predictionArrays(rows, gameIndex):
+    """Pivot prediction rows into (users x games) arrays.
+
+    rows are dicts with user_id, team1, team2, score1 and score2, gameIndex maps
+    (team1, team2) to the game's column. Returns (userIds, picks1, picks2, submitted)
+    where submitted marks the cells a user actually predicted. Rows for games that
+    are not on the scoreboard are ignored.
+    """
+    count = len(rows)
+    users = np.fromiter((row['user_id'] for row in rows), np.int64, count)
+    games = np.fromiter((gameIndex.get((row['team1'], row['team2']), -1) for row in rows), np.int64, count)
+    scores1 = np.fromiter((row['score1'] for row in rows), np.int64, count)
+    scores2 = np.fromiter((row['score2'] for row in rows), np.int64, count)
+    return pivotPredictions(users, games, scores1, scores2, len(gameIndex))
+
+
+def pivotPredictions(users, games, scores1, scores2, gameCount):
+    """predictionArrays for column arrays, games holds each row's column or -1"""
+    keep = games >= 0
+    userIds, userRows = np.unique(users[keep], return_inverse=True)
+    shape = (len(userIds), gameCount)
+    picks1 = np.zeros(shape, np.int64)
+    picks2 = np.zeros(shape, np.int64)
+    submitted = np.zeros(shape, bool)
+    picks1[userRows, games[keep]] = scores1[keep]
+    picks2[userRows, games[keep]] = scores2[keep]
+    submitted[userRows, games[keep]] = True
+    return userIds, picks1, picks2, submitted
+
+
+def gamePoints(picks1, picks2, scores1, scores2):
+    """Points for every (user, game) cell, given actual scores per game"""
+    actual1 = np.asarray(scores1, np.int64)[np.newaxis, :]
+    actual2 = np.asarray(scores2, np.int64)[np.newaxis, :]
+
+    # WINNER SCORING: right winner (or a predicted tie that happened), else 5 if the game tied
+    rightWinner = np.sign(picks1 - picks2) == np.sign(actual1 - actual2)
+    points = np.where(rightWinner, WINNER_POINTS, np.where(actual1 == actual2, TIE_POINTS, 0)).astype(np.float64)
+
+    # SPREAD SCORING
+    difference = np.abs(np.abs(actual1 - actual2) - np.abs(picks1 - picks2))
+    points += np.maximum(SPREAD_POINTS - difference, 0)
+
+    # POINTS SCORING
+    difference = np.abs((actual1 + actual2) - (picks1 + picks2))
+    points += np.maximum(TOTAL_POINTS - 0.5 * difference, 0)
+
+    # PERFECT GAME
+    points += np.where((picks1 == actual1) & (picks2 == actual2), PERFECT_POINTS, 0)
+    return points
+
+
+def scoreWeek(picks1, picks2, submitted, scores1, scores2):
+    """Week totals per user (row), counting only the games each user predicted"""
+    points = gamePoints(picks1, picks2, scores1, scores2)
+    return np.where(submitted, points, 0).sum(axis=1)
@@ -0,0 +1,52 @@
+// Keeps the live score strip current from the server-sent /live stream, or by polling
+// /api/matchups (answered with 304s until a score changes) when this worker's streams are full
+(function () {
+    const strip = document.getElementById('live-scores');
+    if (!strip) {
+        return;
+    }
+    const games = new Map();
+
+    function render() {
+        const started = [...games.values()].filter(game => game.state !== 'pre');
+        strip.hidden = started.length === 0;
+        strip.replaceChildren(...started.map(game => {
+            const badge = document.createElement('span');
+            badge.className = 'badge ' + (game.completed ? 'text-bg-secondary' : 'text-bg-success');
+            badge.textContent = `${game.team1} ${game.score1} - ${game.score2} ${game.team2}` + (game.completed ? ' F' : '');
+            return badge;
+        }));
+    }
+
+    function snapshot(list) {
+        games.clear();
+        list.forEach(game => games.set(game.id, game));
+        render();
+    }
+
+    function poll() {
+        // no-cache revalidates with the stored ETag, an unchanged board costs a 304
+        fetch('api/matchups', {cache: 'no-cache', credentials: 'same-origin'})
+            .then(response => response.ok ? response.json() : null)
+            .then(board => board && snapshot(board.games))
+            .catch(() => {})
+            .finally(() => setTimeout(poll, (Number(strip.dataset.pollSeconds) || 15) * 1000));
+    }
+
+    if (!window.EventSource) {
+        poll();
+        return;
+    }
+    const source = new EventSource('live');
+    source.addEventListener('snapshot', event => snapshot(JSON.parse(event.data)));
+    source.addEventListener('scores', event => {
+        JSON.parse(event.data).forEach(game => games.set(game.id, game));
+        render();
+    });
+    source.addEventListener('error', () => {
+        // a refused stream (503) is closed for good, a dropped one reconnects on its own
+        if (source.readyState === EventSource.CLOSED) {
+            poll();
+        }
+    });
+})();
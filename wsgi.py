@@ -0,0 +1,12 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    uwsgi --http :8000 --module wsgi:app --processes 4 --threads 8 --lazy-apps
+"""
+import os
+
+from app import create_app, warmUp
+
+app = create_app(os.getenv('FLASK_ENV', 'production'))
+# imported once per worker (no preload), so each worker warms its own pool and reads the shared scoreboard
+warmUp(app)